@@ -1,13 +1,43 @@
 import json
 import time
-import requests
+import hashlib
+import mmap
+import bisect
+import heapq
+import uuid
+import itertools
+import random
+import threading
+import logging
+import logging.handlers
+import socket
+import ssl
+import base64
+import struct
+import shutil
+import signal
+import csv
+import gzip
+from collections import deque
+from array import array
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import traceback
+import argparse
 import sys
 import os
 from datetime import datetime, timezone, timedelta
-from playwright.sync_api import sync_playwright, TimeoutError
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Optional
 
+try:
+    import psutil  # Optional: more accurate process tree accounting
+except ImportError:
+    psutil = None
+
+# Heavy dependencies (playwright, requests, pyarrow) are imported where they are
+# used so the offline CLI commands start without loading the browser stack
+
 
 
 
@@ -19,6 +49,8 @@ LOG_CHAT_ID = os.getenv("LOG_CHAT_ID")
 FILE_CHAT_ID = os.getenv("FILE_CHAT_ID")
 
 
+LOGIN_URL = "https://ind.55ace.com/login"
+
 ICE_URL = (
     "https://evo.wcentertainments.com/frontend/evo/r2/"
     "#game=icefishing"
@@ -29,8 +61,66 @@ ICE_URL = (
 # Timezone for IST (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
-# Global flag to signal script completion
-script_completed = False
+# Spin history delivery (DELIVERY_MODE x SPIN_DEDUP):
+#   full,  SPIN_DEDUP=1 (default): upload only spins never delivered before (a
+#          "delta" file); the whole frame goes out only while every spin is new
+#   full,  SPIN_DEDUP=0: upload the whole history frame every time
+#   delta (either): upload only spins never delivered before, plus a periodic
+#          full snapshot after FULL_SNAPSHOT_EVERY deltas or FULL_SNAPSHOT_INTERVAL
+# Frames with no new spins are skipped except in full mode with SPIN_DEDUP=0.
+DELIVERY_MODE = os.getenv("DELIVERY_MODE", "full").lower()
+FULL_SNAPSHOT_EVERY = int(os.getenv("FULL_SNAPSHOT_EVERY", "10"))  # Full snapshot after N deltas
+FULL_SNAPSHOT_INTERVAL = int(os.getenv("FULL_SNAPSHOT_INTERVAL", "86400"))  # ...or after N seconds
+SPIN_STATE_FILE = os.getenv("SPIN_STATE_FILE", "spin_delivery_state.json")
+SPIN_MANIFEST_FILE = os.getenv("SPIN_MANIFEST_FILE", "spin_manifest.jsonl")
+# Persistent index of delivered spins (see DELIVERY_MODE above); with SPIN_DEDUP=1
+# the daily journal also only receives new spins
+SPIN_DEDUP = os.getenv("SPIN_DEDUP", "1") == "1"
+SPIN_INDEX_FILE = os.getenv("SPIN_INDEX_FILE", "spin_index.bin")
+
+# Outbox for Telegram messages/files that could not be delivered yet
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", "telegram_outbox")
+OUTBOX_BASE_BACKOFF = int(os.getenv("OUTBOX_BASE_BACKOFF", "5"))  # seconds
+OUTBOX_MAX_BACKOFF = int(os.getenv("OUTBOX_MAX_BACKOFF", "300"))  # seconds
+
+# Logging: LOG_LEVEL filters everything before formatting, LOG_FILE enables
+# a buffered JSON-lines sink
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "200"))  # Records buffered before a file write
+
+# Hand the game socket over to a native WebSocket client after bootstrap
+DIRECT_WS_MODE = os.getenv("DIRECT_WS_MODE", "0") == "1"
+
+# Frame processing: worker threads for parsing/I/O, optional process parsing
+# for frames of at least FRAME_PROCESS_THRESHOLD bytes (0 disables)
+FRAME_WORKERS = int(os.getenv("FRAME_WORKERS", "4"))
+FRAME_PROCESS_THRESHOLD = int(os.getenv("FRAME_PROCESS_THRESHOLD", "0"))
+
+# Captured spins are journaled per IST day and rolled up into columnar archives
+SPIN_JOURNAL_DIR = os.getenv("SPIN_JOURNAL_DIR", "spin_journal")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "spin_archives")
+
+# Local metrics/health endpoint (0 disables)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Daemon mode keeps the browser warm and captures on a schedule, either every
+# CAPTURE_INTERVAL seconds or on a cron-like CAPTURE_CRON ("*/15 * * * *", IST)
+DAEMON_MODE = os.getenv("DAEMON_MODE", "0") == "1"
+CAPTURE_INTERVAL = int(os.getenv("CAPTURE_INTERVAL", "900"))
+CAPTURE_CRON = os.getenv("CAPTURE_CRON", "")
+CAPTURE_MAX_AGE = int(os.getenv("CAPTURE_MAX_AGE", "0"))  # Reload the game if the cached frame is older (0 = interval)
+
+# Standby browser context parked at the lobby for fast failover
+STANDBY_CONTEXT = os.getenv("STANDBY_CONTEXT", "0") == "1"
+SOCKET_IDLE_TIMEOUT = int(os.getenv("SOCKET_IDLE_TIMEOUT", "180"))  # seconds without frames = hung
+
+# Browser memory footprint
+LOW_MEMORY_MODE = os.getenv("LOW_MEMORY_MODE", "0") == "1"
+BROWSER_MEMORY_LIMIT_MB = int(os.getenv("BROWSER_MEMORY_LIMIT_MB", "0"))  # 0 disables page recycling
+MEMORY_SAMPLE_INTERVAL = int(os.getenv("MEMORY_SAMPLE_INTERVAL", "15"))  # seconds
+RUN_METRICS_FILE = os.getenv("RUN_METRICS_FILE", "run_metrics.json")
 
 # Global flag to signal script completion
 script_completed = False
@@ -89,6 +179,529 @@ def get_filename_timestamp():
     """Get timestamp for filename in YYYYMMDD_HHMMSS format"""
     return get_ist_time().strftime("%Y%m%d_%H%M%S")
 
+# ================= RUN METRICS =================
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, float("inf"))
+
+class RunMetrics:
+    """Thread-safe counters, gauges and samples collected during a run"""
+    
+    def __init__(self, max_samples=500):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.max_samples = max_samples
+        self.counters = {}
+        self.gauges = {}
+        self.samples = {}
+        self.histograms = {}
+    
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+    
+    def incr(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+    
+    def get(self, name, default=None, **labels):
+        """Current value of a gauge"""
+        with self.lock:
+            return self.gauges.get(self._key(name, labels), default)
+    
+    def set_max(self, name, value, **labels):
+        """Keep the highest value seen for a gauge"""
+        key = self._key(name, labels)
+        with self.lock:
+            if value > self.gauges.get(key, value - 1):
+                self.gauges[key] = value
+    
+    def observe(self, name, value, **labels):
+        """Add an observation (milliseconds) to a fixed-bucket histogram"""
+        key = self._key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"count": 0, "sum": 0.0, "max": 0.0,
+                                               "buckets": [0] * len(LATENCY_BUCKETS_MS)}
+            hist["count"] += 1
+            hist["sum"] += value
+            hist["max"] = max(hist["max"], value)
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+                    break
+    
+    def sample(self, name, value):
+        """Record a timestamped sample (bounded per series)"""
+        with self.lock:
+            series = self.samples.setdefault(name, [])
+            series.append((round(time.time() - self.started, 3), value))
+            if len(series) > self.max_samples:
+                del series[0]
+    
+    def snapshot(self):
+        """Plain dict copy of everything collected so far"""
+        def flatten(items):
+            out = {}
+            for (name, labels), value in items:
+                if labels:
+                    name = name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+                out[name] = value
+            return out
+        
+        def histogram(hist):
+            cumulative, buckets = 0, {}
+            for bound, count in zip(LATENCY_BUCKETS_MS, hist["buckets"]):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {"count": hist["count"], "sum_ms": round(hist["sum"], 3), "max_ms": round(hist["max"], 3),
+                    "avg_ms": round(hist["sum"] / hist["count"], 3) if hist["count"] else None,
+                    "buckets_ms": buckets}
+        
+        with self.lock:
+            return {
+                "started_at": format_ist_time(datetime.fromtimestamp(self.started, IST)),
+                "uptime_seconds": round(time.time() - self.started, 3),
+                "counters": flatten(self.counters.items()),
+                "gauges": flatten(self.gauges.items()),
+                "histograms": flatten((key, histogram(h)) for key, h in self.histograms.items()),
+                "samples": {name: list(series) for name, series in self.samples.items()},
+            }
+    
+    def prometheus(self, prefix="icefishing", extra=None):
+        """Counters and numeric gauges in Prometheus text exposition format.
+        
+        extra adds derived gauges (name -> value) that are not stored here.
+        """
+        def escape(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        
+        def line(name, labels, value):
+            label_str = ",".join(f'{k}="{escape(v)}"' for k, v in labels)
+            return f"{prefix}_{name}{{{label_str}}} {value}" if label_str else f"{prefix}_{name} {value}"
+        
+        with self.lock:
+            counters = sorted(self.counters.items(), key=lambda item: item[0])
+            gauges = sorted(self.gauges.items(), key=lambda item: item[0])
+            histograms = sorted(((key, dict(h, buckets=list(h["buckets"]))) for key, h in self.histograms.items()),
+                                key=lambda item: item[0])
+        
+        lines = [f"# TYPE {prefix}_uptime_seconds gauge",
+                 line("uptime_seconds", (), round(time.time() - self.started, 3))]
+        for name, value in (extra or {}).items():
+            if value is None:
+                continue
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(line(name, (), int(value) if isinstance(value, bool) else value))
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                typed.add(name)
+            lines.append(line(name + "_total", labels, value))
+        for (name, labels), value in gauges:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                # Text gauges become an info-style series with the value as a label
+                labels = labels + (("value", value),)
+                value = 1
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                typed.add(name)
+            lines.append(line(name, labels, value))
+        for (name, labels), hist in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_MS, hist["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(line(name + "_bucket", labels + (("le", le),), cumulative))
+            lines.append(line(name + "_sum", labels, round(hist["sum"], 3)))
+            lines.append(line(name + "_count", labels, hist["count"]))
+        return "\n".join(lines) + "\n"
+    
+    def export(self, filename=RUN_METRICS_FILE):
+        """Write the metrics snapshot to a JSON file"""
+        if not filename:
+            return None
+        try:
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+            return filename
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write run metrics: {e}", extra=NO_TELEGRAM)
+            return None
+
+# Initialize run metrics
+metrics = RunMetrics()
+
+# ================= SPIN LATENCY TRACING =================
+TRACE_STAGES = ("received", "parsed", "stored", "summarized", "upload_start", "upload_ack")
+
+class SpinTrace:
+    """Monotonic stage timestamps for one spinHistory frame on its way to Telegram"""
+    
+    def __init__(self, received_at=None):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.marks = {"received": received_at if received_at is not None else time.monotonic()}
+    
+    def mark(self, stage, at=None):
+        self.marks[stage] = at if at is not None else time.monotonic()
+    
+    def finish(self):
+        """Record per-stage and end-to-end latencies in the run metrics"""
+        previous = None
+        for stage in TRACE_STAGES:
+            if stage not in self.marks:
+                continue
+            if previous is not None:
+                metrics.observe("spin_stage_latency_ms", (self.marks[stage] - self.marks[previous]) * 1000, stage=stage)
+            previous = stage
+        total_ms = (self.marks[previous] - self.marks["received"]) * 1000
+        metrics.observe("spin_end_to_end_latency_ms", total_ms, final_stage=previous)
+        print_and_notify(f"Trace {self.trace_id}: {total_ms:.0f} ms received → {previous}", "DEBUG", send_to_telegram=False)
+
+def log_latency_summary():
+    """Print per-stage latency stats collected during the run"""
+    histograms = metrics.snapshot()["histograms"]
+    for name, hist in sorted(histograms.items()):
+        if name.startswith("spin_") and hist["count"]:
+            print_and_notify(f"⏱ {name}: n={hist['count']} avg={hist['avg_ms']:.1f} ms max={hist['max_ms']:.1f} ms",
+                             "INFO", send_to_telegram=False)
+
+# ================= METRICS HTTP ENDPOINT =================
+# current_step values that mean the monitor is not capturing
+HEALTH_FAILURE_STEPS = ("Failed", "Page crashed")
+
+def health_status(snapshot):
+    """Derived health fields for a metrics snapshot and the problems found (empty when healthy)"""
+    gauges = snapshot["gauges"]
+    now = time.time()
+    last_frame = gauges.get("last_frame_time")
+    problems = []
+    
+    step = gauges.get("current_step")
+    if step in HEALTH_FAILURE_STEPS:
+        problems.append(f"step: {step}")
+    for name, value in sorted(gauges.items()):
+        if name.startswith("circuit_open{") and value:
+            problems.append(name)
+    # Idle time only counts once monitoring started (login takes a while)
+    idle_since = max(last_frame or 0, gauges.get("monitoring_since") or 0)
+    if SOCKET_IDLE_TIMEOUT and idle_since and not script_completed and now - idle_since > SOCKET_IDLE_TIMEOUT:
+        problems.append(f"no frames for {SOCKET_IDLE_TIMEOUT}s")
+    
+    fields = {
+        "seconds_since_last_frame": round(now - last_frame, 3) if last_frame else None,
+        "completed": script_completed,
+        "healthy": not problems,
+    }
+    return fields, problems
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves /metrics (Prometheus text), /metrics.json and /health (JSON, 503 when unhealthy)"""
+    
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        status = 200
+        if path == "/metrics":
+            fields, _ = health_status(metrics.snapshot())
+            body = metrics.prometheus(extra=fields).encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path in ("/metrics.json", "/health"):
+            snapshot = metrics.snapshot()
+            fields, problems = health_status(snapshot)
+            snapshot.update(fields, problems=problems)
+            if path == "/health" and problems:
+                status = 503
+            body = json.dumps(snapshot, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the console
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """Start the metrics endpoint on a daemon thread (port 0 disables it)"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    except OSError as e:
+        logger.warning(f"⚠️ Metrics endpoint not started on {host}:{port}: {e}", extra=NO_TELEGRAM)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+# ================= RETRY POLICY & CIRCUIT BREAKERS =================
+class CircuitOpenError(Exception):
+    """Raised instead of retrying while a dependency's breaker is open"""
+    pass
+
+class CircuitBreaker:
+    """Per-dependency breaker: opens after repeated failures, probes for recovery.
+    
+    While open every call fails fast. Once the reset timeout expires a single
+    cheap probe (or, without a probe, one real call) decides whether to close
+    again; each consecutive re-open doubles the timeout up to max_reset_timeout.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    
+    def __init__(self, name, failure_threshold=3, reset_timeout=30, max_reset_timeout=600, probe=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe = probe
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+    
+    def _set_state(self, state):
+        self.state = state
+        metrics.set("circuit_open", 0 if state == self.CLOSED else 1, dependency=self.name)
+    
+    def retry_in(self):
+        return max(0, int(self.opened_at + self.reset_timeout - time.time()))
+    
+    def allow(self):
+        """May a call go through now? Runs the recovery probe when due"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.probing or time.time() < self.opened_at + self.reset_timeout:
+                return False
+            self.probing = True
+            self._set_state(self.HALF_OPEN)
+        
+        if self.probe is None:
+            return True  # The caller's next attempt is the probe
+        try:
+            healthy = bool(self.probe())
+        except Exception:
+            healthy = False
+        metrics.incr("circuit_probes", dependency=self.name, result="ok" if healthy else "failed")
+        if healthy:
+            self.record_success()
+        else:
+            self.record_failure()
+        return healthy
+    
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit open - retry in {self.retry_in()}s")
+    
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info(f"🔌 {self.name} circuit closed - dependency recovered", extra=NO_TELEGRAM)
+            self.failures = 0
+            self.probing = False
+            self.reset_timeout = self.base_reset_timeout
+            self._set_state(self.CLOSED)
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            elif self.state == self.OPEN or self.failures < self.failure_threshold:
+                return
+            self.probing = False
+            self.opened_at = time.time()
+            self._set_state(self.OPEN)
+            metrics.incr("circuit_opened", dependency=self.name)
+        logger.warning(f"⛔ {self.name} circuit open for {self.reset_timeout}s after {self.failures} failures", extra=NO_TELEGRAM)
+
+class RetryPolicy:
+    """Exponential backoff with jitter, cut short by an open circuit breaker"""
+    
+    def __init__(self, max_attempts=3, base_delay=2.0, max_delay=30.0, jitter=0.5):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+    
+    def delay(self, attempt):
+        """Backoff before retry number attempt+1 (attempt counts from 0)"""
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    def failed(self, attempt, breaker=None, sleep=True):
+        """Record a failed attempt and back off; raises CircuitOpenError instead of sleeping"""
+        if breaker is not None:
+            breaker.record_failure()
+            breaker.check()
+        if sleep:
+            time.sleep(self.delay(attempt))
+
+def probe_url(url, timeout=10):
+    """Cheap reachability check (HEAD request, any non-5xx answer counts)"""
+    import requests
+    return requests.head(url, timeout=timeout, allow_redirects=True).status_code < 500
+
+breakers = {
+    "login": CircuitBreaker("login", probe=lambda: probe_url(LOGIN_URL)),
+    "lobby": CircuitBreaker("lobby"),
+    "telegram": CircuitBreaker("telegram", failure_threshold=4,
+                               probe=lambda: probe_url(f"https://api.telegram.org/bot{BOT_TOKEN}/getMe")),
+}
+
+retry_policies = {
+    "login": RetryPolicy(max_attempts=3, base_delay=3, max_delay=30),
+    "lobby": RetryPolicy(max_attempts=3, base_delay=2, max_delay=20),
+    "telegram": RetryPolicy(max_attempts=3, base_delay=2, max_delay=30),
+}
+
+# ================= TELEGRAM OUTBOX =================
+class TelegramOutbox:
+    """Disk spool for messages and files that could not be delivered yet.
+    
+    Only transient failures are spooled; entries Telegram rejects outright
+    (4xx) are moved to dead/ so they cannot block the queue.
+    """
+    
+    def __init__(self, directory: str = OUTBOX_DIR):
+        self.directory = directory
+        self.dead_directory = os.path.join(directory, "dead")
+        self.lock = threading.Lock()  # Held by drain() for its whole run
+        self.counter = itertools.count(1)  # Lock-free, so enqueueing never waits on a drain
+        self.failures = 0
+        self.next_attempt = 0
+    
+    def pending(self):
+        """Spooled entry files, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.join(self.directory, n) for n in names if n.endswith(".entry.json"))
+    
+    def __len__(self):
+        return len(self.pending())
+    
+    def in_backoff(self):
+        return time.time() < self.next_attempt
+    
+    def _entry_name(self):
+        counter = next(self.counter) % 10000
+        # Nanosecond timestamp keeps entries ordered across restarts
+        return f"{time.time_ns():020d}_{counter:04d}"
+    
+    def _write_entry(self, name, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name + ".entry.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        metrics.set("outbox_depth", len(self.pending()))
+        return path
+    
+    def _dead_letter(self, path, entry, reason):
+        """Move an entry Telegram rejected (and its file) out of the queue"""
+        os.makedirs(self.dead_directory, exist_ok=True)
+        if entry.get("kind") == "file" and os.path.exists(entry.get("path", "")):
+            stored = os.path.join(self.dead_directory, os.path.basename(entry["path"]))
+            os.replace(entry["path"], stored)
+            entry["path"] = stored
+        entry["rejected"] = reason
+        with open(os.path.join(self.dead_directory, os.path.basename(path)), "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.remove(path)
+        metrics.incr("outbox_dead_letters")
+        logger.warning(f"⚠️ Telegram rejected outbox entry, moved to {self.dead_directory}: {reason}", extra=NO_TELEGRAM)
+    
+    def enqueue_message(self, chat_id, text, parse_mode="HTML"):
+        entry = {"kind": "message", "chat_id": chat_id, "text": text,
+                 "parse_mode": parse_mode, "queued_at": format_ist_time()}
+        return self._write_entry(self._entry_name(), entry)
+    
+    def enqueue_file(self, chat_id, filename, caption=""):
+        """Spool a copy of the file so later cleanup of the original is harmless"""
+        name = self._entry_name()
+        os.makedirs(self.directory, exist_ok=True)
+        stored = os.path.join(self.directory, f"{name}_{os.path.basename(filename)}")
+        try:
+            os.link(filename, stored)
+        except OSError:
+            shutil.copy2(filename, stored)
+        entry = {"kind": "file", "chat_id": chat_id, "path": stored,
+                 "caption": caption, "queued_at": format_ist_time()}
+        return self._write_entry(name, entry)
+    
+    def drain(self, notifier, force=False):
+        """Deliver spooled entries in order, backing off exponentially on failure"""
+        if (self.in_backoff() and not force) or not self.lock.acquire(blocking=False):
+            return 0
+        delivered = 0
+        try:
+            for path in self.pending():
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                except Exception as e:
+                    logger.warning(f"⚠️ Dropping unreadable outbox entry {path}: {e}", extra=NO_TELEGRAM)
+                    os.remove(path)
+                    continue
+                
+                if entry["kind"] == "file":
+                    if not os.path.exists(entry["path"]):
+                        logger.warning(f"⚠️ Outbox file missing, dropping entry: {entry['path']}", extra=NO_TELEGRAM)
+                        os.remove(path)
+                        continue
+                    result = notifier.send_file(entry["path"], entry.get("caption", ""),
+                                                chat_id_override=entry["chat_id"], spool=False)
+                else:
+                    result = notifier.send_message(entry["text"], entry.get("parse_mode", "HTML"),
+                                                   chat_id_override=entry["chat_id"], spool=False)
+                
+                if result is not None and not result.get("ok"):
+                    # Permanent rejection: retrying would block everything behind it
+                    self._dead_letter(path, entry, f"{result.get('error_code')} {result.get('description', '')}"[:200])
+                    continue
+                
+                if not result:
+                    # Keep order: stop at the first failure and retry later
+                    self.failures += 1
+                    delay = min(OUTBOX_MAX_BACKOFF, OUTBOX_BASE_BACKOFF * 2 ** (self.failures - 1))
+                    self.next_attempt = time.time() + delay
+                    logger.warning(f"⚠️ Outbox delivery failed, retrying in {delay}s ({len(self.pending())} pending)", extra=NO_TELEGRAM)
+                    break
+                
+                os.remove(path)
+                if entry["kind"] == "file":
+                    try:
+                        os.remove(entry["path"])
+                    except OSError:
+                        pass
+                delivered += 1
+                self.failures = 0
+                self.next_attempt = 0
+        finally:
+            self.lock.release()
+            metrics.set("outbox_depth", len(self.pending()))
+        
+        if delivered:
+            logger.info(f"📬 Delivered {delivered} queued Telegram item(s)", extra=NO_TELEGRAM)
+        return delivered
+
 # ================= IMPROVED DUAL TELEGRAM MANAGER =================
 class DualTelegramNotifier:
     """Handles Telegram communications with rate limiting"""
@@ -98,12 +711,48 @@ class DualTelegramNotifier:
         self.log_chat_id = log_chat_id
         self.file_chat_id = file_chat_id
         self.rate_limiter = RateLimiter()
-        self.max_retries = 3
-        self.retry_delay = 5  # seconds
+        self.retry_policy = retry_policies["telegram"]
+        self.breaker = breakers["telegram"]
+        self.retry_delay = 5  # seconds, fallback when a 429 carries no retry_after
+        self.outbox = None
+    
+    def _timed_post(self, method: str, url: str, **kwargs):
+        """requests.post that records Telegram latency and error counts"""
+        import requests
+        started = time.monotonic()
+        try:
+            response = requests.post(url, **kwargs)
+        except Exception:
+            metrics.incr("telegram_errors", method=method)
+            raise
+        latency_ms = round((time.monotonic() - started) * 1000, 1)
+        metrics.set("telegram_latency_ms", latency_ms, method=method)
+        metrics.sample("telegram_latency_ms", latency_ms)
+        if response.status_code != 200:
+            metrics.incr("telegram_errors", method=method)
+        return response
+    
+    @staticmethod
+    def _rejected(response):
+        """Telegram's error body for a client error: {"ok": False, "error_code": 400, ...}"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return {"ok": False, "error_code": response.status_code,
+                "description": body.get("description") or response.text[:100]}
+    
+    def _outbox_blocked(self):
+        """True if new items must queue behind the outbox instead of being sent now"""
+        if self.outbox is None:
+            return False
+        if len(self.outbox) and not self.outbox.in_backoff():
+            self.outbox.drain(self)
+        return len(self.outbox) > 0
         
     def send_message(self, text: str, parse_mode: str = "HTML", 
                     is_file_notification: bool = False, 
-                    chat_id_override: str = None) -> Optional[dict]:
+                    chat_id_override: str = None, spool: bool = True) -> Optional[dict]:
         
         # Determine chat ID
         if chat_id_override:
@@ -113,6 +762,17 @@ class DualTelegramNotifier:
         else:
             chat_id = self.log_chat_id
         
+        if spool and self._outbox_blocked():
+            self.outbox.enqueue_message(chat_id, text, parse_mode)
+            return {"ok": False, "queued": True}
+        
+        result = self._post_message(chat_id, text, parse_mode)
+        if result is None and spool and self.outbox is not None:
+            self.outbox.enqueue_message(chat_id, text, parse_mode)
+            return {"ok": False, "queued": True}
+        return result
+    
+    def _post_message(self, chat_id: str, text: str, parse_mode: str) -> Optional[dict]:
         # Apply rate limiting
         self.rate_limiter.wait_if_needed(chat_id)
         
@@ -124,46 +784,71 @@ class DualTelegramNotifier:
             "disable_web_page_preview": True
         }
         
-        for attempt in range(self.max_retries):
+        if not self.breaker.allow():
+            return None  # Fail fast while Telegram is down (callers spool to the outbox)
+        
+        for attempt in range(self.retry_policy.max_attempts):
+            last_attempt = attempt == self.retry_policy.max_attempts - 1
             try:
-                response = requests.post(url, json=payload, timeout=15)
+                response = self._timed_post("sendMessage", url, json=payload, timeout=15)
                 
                 if response.status_code == 200:
+                    self.breaker.record_success()
                     return response.json()
                 elif response.status_code == 429:
-                    # Rate limited - wait and retry
+                    # Rate limited - wait and retry (the API is up, so no breaker failure)
                     retry_after = response.json().get('parameters', {}).get('retry_after', self.retry_delay)
-                    if attempt < self.max_retries - 1:
+                    if not last_attempt:
                         time.sleep(retry_after)
                         continue
                     else:
-                        print(f"❌ Telegram API rate limit exceeded after {self.max_retries} attempts")
+                        logger.error(f"❌ Telegram API rate limit exceeded after {self.retry_policy.max_attempts} attempts", extra=NO_TELEGRAM)
                         return None
+                elif response.status_code < 500:
+                    # Client error (unparseable HTML, unknown chat...): retrying cannot help and
+                    # Telegram itself answered, so it is no breaker failure either
+                    self.breaker.record_success()
+                    logger.error(f"❌ Telegram API error {response.status_code}: {response.text[:100]}", extra=NO_TELEGRAM)
+                    return self._rejected(response)
                 else:
-                    print(f"❌ Telegram API error {response.status_code}: {response.text[:100]}")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay)
-                        continue
-                    return None
+                    logger.error(f"❌ Telegram API error {response.status_code}: {response.text[:100]}", extra=NO_TELEGRAM)
                     
             except Exception as e:
-                print(f"❌ Telegram connection error: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
+                logger.error(f"❌ Telegram connection error: {e}", extra=NO_TELEGRAM)
+            
+            try:
+                self.retry_policy.failed(attempt, self.breaker, sleep=not last_attempt)
+            except CircuitOpenError:
+                return None
         
         return None
     
-    def send_file(self, filename: str, caption: str = "", chat_id_override: str = None) -> Optional[dict]:
-        """Send file to Telegram with rate limiting"""
+    def send_file(self, filename: str, caption: str = "", chat_id_override: str = None,
+                  spool: bool = True) -> Optional[dict]:
+        """Send file to Telegram with rate limiting, spooling it to the outbox on failure"""
+        chat_id = chat_id_override or self.file_chat_id
         
+        if spool and self._outbox_blocked():
+            self.outbox.enqueue_file(chat_id, filename, caption)
+            return {"ok": False, "queued": True}
+        
+        result = self._post_file(chat_id, filename, caption)
+        if result is None and spool and self.outbox is not None:
+            self.outbox.enqueue_file(chat_id, filename, caption)
+            return {"ok": False, "queued": True}
+        return result
+    
+    def _post_file(self, chat_id: str, filename: str, caption: str) -> Optional[dict]:
         # Apply rate limiting
-        chat_id = chat_id_override or self.file_chat_id
         self.rate_limiter.wait_if_needed(chat_id)
         
         url = f"https://api.telegram.org/bot{self.bot_token}/sendDocument"
         
-        for attempt in range(self.max_retries):
+        if not self.breaker.allow():
+            return None  # Fail fast while Telegram is down (callers spool to the outbox)
+        
+        for attempt in range(self.retry_policy.max_attempts):
+            last_attempt = attempt == self.retry_policy.max_attempts - 1
             try:
                 with open(filename, 'rb') as f:
                     files = {'document': f}
@@ -172,75 +857,189 @@ class DualTelegramNotifier:
                         'caption': caption[:1024],
                         'parse_mode': 'HTML'
                     }
-                    response = requests.post(url, files=files, data=data, timeout=30)
+                    response = self._timed_post("sendDocument", url, files=files, data=data, timeout=30)
                     
                     if response.status_code == 200:
+                        self.breaker.record_success()
                         return response.json()
                     elif response.status_code == 429:
                         retry_after = response.json().get('parameters', {}).get('retry_after', self.retry_delay)
-                        if attempt < self.max_retries - 1:
+                        if not last_attempt:
                             time.sleep(retry_after)
                             continue
                         else:
-                            print(f"❌ Telegram API rate limit exceeded when sending file")
+                            logger.error(f"❌ Telegram API rate limit exceeded when sending file", extra=NO_TELEGRAM)
                             return None
+                    elif response.status_code < 500:
+                        self.breaker.record_success()
+                        logger.error(f"❌ Telegram file error {response.status_code}: {response.text[:100]}", extra=NO_TELEGRAM)
+                        return self._rejected(response)
                     else:
-                        print(f"❌ Telegram file error {response.status_code}")
-                        if attempt < self.max_retries - 1:
-                            time.sleep(self.retry_delay)
-                            continue
+                        logger.error(f"❌ Telegram file error {response.status_code}", extra=NO_TELEGRAM)
                             
             except Exception as e:
-                print(f"❌ Telegram file connection error: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
+                logger.error(f"❌ Telegram file connection error: {e}", extra=NO_TELEGRAM)
+            
+            try:
+                self.retry_policy.failed(attempt, self.breaker, sleep=not last_attempt)
+            except CircuitOpenError:
+                return None
         
         return None
 
-# Initialize dual Telegram notifier
-tg = DualTelegramNotifier(BOT_TOKEN, LOG_CHAT_ID, FILE_CHAT_ID)
+# Dual Telegram notifier, built by init_telegram() for the commands that send
+tg = None
 
-# ================= ENHANCED PRINT FUNCTION =================
-def print_and_notify(message: str, level: str = "INFO", send_to_telegram: bool = True, 
-                    is_file_notification: bool = False, chat_id_override: str = None):
-    """Print to console and optionally send to Telegram with rate limiting"""
-    
-    colors = {
-        "INFO": "\033[94m",
-        "SUCCESS": "\033[92m",
-        "WARNING": "\033[93m",
-        "ERROR": "\033[91m",
-        "DEBUG": "\033[90m",
-    }
-    reset = "\033[0m"
+def init_telegram():
+    """Create the Telegram notifier and its outbox on first use"""
+    global tg
+    if tg is None:
+        notifier = DualTelegramNotifier(BOT_TOKEN, LOG_CHAT_ID, FILE_CHAT_ID)
+        notifier.outbox = TelegramOutbox()
+        tg = notifier
+    return tg
+
+# ================= LOGGING PIPELINE =================
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+# Extra for records that must never reach Telegram (the notifier's own
+# diagnostics, which would otherwise recurse into it)
+NO_TELEGRAM = {"send_to_telegram": False}
+
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "SUCCESS": SUCCESS,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+LEVEL_COLORS = {
+    "INFO": "\033[94m",
+    "SUCCESS": "\033[92m",
+    "WARNING": "\033[93m",
+    "ERROR": "\033[91m",
+    "DEBUG": "\033[90m",
+}
+COLOR_RESET = "\033[0m"
+
+LEVEL_ICONS = {
+    "INFO": "ℹ️",
+    "SUCCESS": "✅",
+    "WARNING": "⚠️",
+    "ERROR": "❌",
+    "DEBUG": "🔍",
+}
+
+class ConsoleFormatter(logging.Formatter):
+    """Coloured console line with IST timestamp"""
     
-    # Use IST time for all timestamps
-    timestamp = format_ist_time()
+    def format(self, record):
+        timestamp = format_ist_time(datetime.fromtimestamp(record.created, IST))
+        color = LEVEL_COLORS.get(record.levelname, '')
+        return f"{color}[{timestamp} IST] [{record.levelname}] {record.getMessage()}{COLOR_RESET}"
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record for the log file"""
     
-    level_icon = {
-        "INFO": "ℹ️",
-        "SUCCESS": "✅",
-        "WARNING": "⚠️",
-        "ERROR": "❌",
-        "DEBUG": "🔍",
-    }
+    def format(self, record):
+        return json.dumps({
+            "time": datetime.fromtimestamp(record.created, IST).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+            "telegram": getattr(record, "send_to_telegram", False),
+        }, ensure_ascii=False)
+
+class ConsoleHandler(logging.StreamHandler):
+    """Console output that only flushes for warnings or every flush_interval seconds"""
+    
+    def __init__(self, stream=None, flush_interval=0.5):
+        super().__init__(stream or sys.stdout)
+        self.flush_interval = flush_interval
+        self.last_flush = 0
     
-    console_msg = f"{colors.get(level, '')}[{timestamp} IST] [{level}] {message}{reset}"
-    print(console_msg)
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            now = time.monotonic()
+            if record.levelno >= logging.WARNING or now - self.last_flush >= self.flush_interval:
+                self.stream.flush()
+                self.last_flush = now
+        except Exception:
+            self.handleError(record)
+
+class TelegramHandler(logging.Handler):
+    """Forwards records to the log channel (DEBUG never reaches Telegram)"""
     
-    # Skip Telegram for DEBUG messages to reduce API calls
-    if level == "DEBUG":
-        send_to_telegram = False
+    def __init__(self, level=logging.INFO):
+        super().__init__(level)
     
-    if send_to_telegram:
-        tg_message = f"{level_icon.get(level, '📝')} <b>{level}</b>\n{message}"
-        
-        if len(tg_message) > 4000:
-            tg_message = tg_message[:4000] + "..."
-        
-        tg.send_message(tg_message, is_file_notification=is_file_notification, 
-                       chat_id_override=chat_id_override)
+    def emit(self, record):
+        if not getattr(record, "send_to_telegram", False) or tg is None:
+            return
+        try:
+            level = record.levelname
+            tg_message = f"{LEVEL_ICONS.get(level, '📝')} <b>{level}</b>\n{record.getMessage()}"
+            
+            if len(tg_message) > 4000:
+                tg_message = tg_message[:4000] + "..."
+            
+            tg.send_message(tg_message, is_file_notification=getattr(record, "is_file_notification", False),
+                            chat_id_override=getattr(record, "chat_id_override", None))
+        except Exception:
+            self.handleError(record)
+
+class MetricsHandler(logging.Handler):
+    """Counts warnings and errors for the run metrics"""
+    
+    def __init__(self):
+        super().__init__(logging.WARNING)
+    
+    def emit(self, record):
+        metrics.incr("log_messages", level=record.levelname)
+
+def setup_logging(level=LOG_LEVEL, log_file=LOG_FILE):
+    """Build the monitor logger: console, Telegram and optional buffered JSON-lines file"""
+    log = logging.getLogger("icefishing")
+    log.handlers.clear()
+    log.propagate = False
+    log.setLevel(LOG_LEVELS.get(level.upper(), logging.DEBUG))
+    
+    console = ConsoleHandler()
+    console.setFormatter(ConsoleFormatter())
+    log.addHandler(console)
+    
+    log.addHandler(TelegramHandler())
+    log.addHandler(MetricsHandler())
+    
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler.setFormatter(JsonLinesFormatter())
+        # Buffer records in memory, write them out in batches (immediately on errors)
+        log.addHandler(logging.handlers.MemoryHandler(
+            LOG_BUFFER_SIZE, flushLevel=logging.ERROR, target=file_handler))
+    return log
+
+logger = setup_logging()
+
+# ================= ENHANCED PRINT FUNCTION =================
+def print_and_notify(message: str, level: str = "INFO", send_to_telegram: bool = True, 
+                    is_file_notification: bool = False, chat_id_override: str = None):
+    """Log to console and optionally send to Telegram with rate limiting"""
+    
+    # Level check happens before any formatting so suppressed calls cost almost nothing
+    levelno = LOG_LEVELS.get(level, logging.INFO)
+    if not logger.isEnabledFor(levelno):
+        return
+    
+    logger.log(levelno, message, extra={
+        # Skip Telegram for DEBUG messages to reduce API calls
+        "send_to_telegram": send_to_telegram and level != "DEBUG",
+        "is_file_notification": is_file_notification,
+        "chat_id_override": chat_id_override,
+    })
 
 # ================= BATCH MESSAGE SENDER =================
 def send_batch_messages(messages, delay=2):
@@ -249,38 +1048,587 @@ def send_batch_messages(messages, delay=2):
         print_and_notify(message, level, send_to_tg)
         time.sleep(delay)
 
+# ================= SPIN HISTORY HELPERS =================
+SPIN_HISTORY_PATHS = [
+    ('data', 'spinHistory'),
+    ('spinHistory',),
+    ('history',),
+]
+SPIN_ID_KEYS = ('id', 'spinId', 'roundId', 'gameId', 'gameRoundId')
+
+def locate_spin_history(data):
+    """Find the spin list inside a frame, returns (path, spins) or (None, None)"""
+    if not isinstance(data, dict):
+        return None, None
+    for path in SPIN_HISTORY_PATHS:
+        node = data
+        for key in path:
+            if isinstance(node, dict) and key in node:
+                node = node[key]
+            else:
+                node = None
+                break
+        if isinstance(node, list):
+            return path, node
+    return None, None
+
+def replace_spin_history(data, path, spins):
+    """Return a copy of the frame with the spin list at path replaced"""
+    copy = dict(data)
+    node = copy
+    for key in path[:-1]:
+        node[key] = dict(node[key])
+        node = node[key]
+    node[path[-1]] = spins
+    return copy
+
+def spin_identifier(spin):
+    """Stable identifier for a spin (its ID field, or a content hash)"""
+    if isinstance(spin, dict):
+        for key in SPIN_ID_KEYS:
+            if spin.get(key) is not None:
+                return str(spin[key])
+    raw = json.dumps(spin, sort_keys=True, ensure_ascii=False)
+    return "sha1:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+# ================= SPIN RECORDS =================
+# Normalised field -> key aliases seen in spin history frames
+SPIN_FIELD_ALIASES = {
+    "bet": ('bet', 'stake', 'wager'),
+    "win": ('win', 'payout', 'winnings'),
+    "fish": ('fishCaught', 'fish', 'catch'),
+    "multiplier": ('multiplier', 'mult'),
+}
+
+def to_float(value):
+    """Numeric field as float, None if missing or not numeric"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return None
+
+class SpinRecord:
+    """Compact, typed view of one spin shared by all downstream consumers"""
+    FIELDS = ("spin_id", "bet", "win", "fish", "multiplier")
+    __slots__ = FIELDS + ("unparsed",)
+    
+    def __init__(self, spin_id, bet=None, win=None, fish=None, multiplier=None, unparsed=None):
+        self.spin_id = spin_id
+        self.bet = bet
+        self.win = win
+        self.fish = fish
+        self.multiplier = multiplier
+        self.unparsed = unparsed  # field -> raw value for numeric fields that were not numbers
+    
+    def display(self, field):
+        """Value for human-readable output, falling back to the raw frame value"""
+        value = getattr(self, field)
+        if value is None and self.unparsed:
+            return self.unparsed.get(field)
+        return value
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+    
+    def __repr__(self):
+        return f"SpinRecord({self.to_dict()})"
+
+class SpinDecoder:
+    """Decoder compiled for one frame schema (spin list path + resolved keys)"""
+    
+    def __init__(self, path, keys, id_key, signature):
+        self.path = path
+        self.keys = keys  # normalised field -> frame key (or None)
+        self.id_key = id_key
+        self.signature = signature
+    
+    @classmethod
+    def detect(cls, data):
+        """Inspect a frame once and compile a decoder for its layout"""
+        path, spins = locate_spin_history(data)
+        if path is None:
+            return None
+        first = spins[0] if spins and isinstance(spins[0], dict) else {}
+        # Optional fields may be missing from the newest spin, so look at a few
+        seen = set()
+        for spin in spins[:20]:
+            if isinstance(spin, dict):
+                seen.update(spin)
+        keys = {}
+        for field, aliases in SPIN_FIELD_ALIASES.items():
+            keys[field] = next((key for key in aliases if key in seen), None)
+        id_key = next((key for key in SPIN_ID_KEYS if key in seen), None)
+        return cls(path, keys, id_key, frozenset(first))
+    
+    def spins(self, data):
+        """Raw spin list at the compiled path, None if the frame does not match"""
+        node = data
+        for key in self.path:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        return node if isinstance(node, list) else None
+    
+    def matches(self, spins):
+        if not spins:
+            return True
+        first = spins[0]
+        return isinstance(first, dict) and frozenset(first) == self.signature
+    
+    def decode(self, spins):
+        numeric = [(field, self.keys[field]) for field in ("bet", "win", "multiplier") if self.keys[field]]
+        fish_key = self.keys["fish"]
+        id_key = self.id_key
+        records = []
+        for spin in spins:
+            if not isinstance(spin, dict):
+                records.append(SpinRecord(spin_identifier(spin)))
+                continue
+            spin_id = spin.get(id_key) if id_key else None
+            fish = spin.get(fish_key) if fish_key else None
+            values, unparsed = {}, None
+            for field, key in numeric:
+                raw = spin.get(key)
+                value = values[field] = to_float(raw)
+                if value is None and raw is not None:
+                    unparsed = unparsed or {}
+                    unparsed[field] = raw
+            records.append(SpinRecord(
+                str(spin_id) if spin_id is not None else spin_identifier(spin),
+                values.get("bet"),
+                values.get("win"),
+                fish if fish is None or isinstance(fish, (str, int, float)) else json.dumps(fish, ensure_ascii=False),
+                values.get("multiplier"),
+                unparsed,
+            ))
+        return records
+
+_spin_decoder = None
+
+def decode_spin_frame(data):
+    """Decode a frame into (path, raw spins, records), reusing the cached schema.
+    
+    Returns (None, None, []) when the frame holds no spin list.
+    """
+    global _spin_decoder
+    decoder = _spin_decoder
+    spins = decoder.spins(data) if decoder is not None and isinstance(data, dict) else None
+    if spins is None or not decoder.matches(spins):
+        decoder = SpinDecoder.detect(data)
+        if decoder is None:
+            return None, None, []
+        _spin_decoder = decoder
+        spins = decoder.spins(data)
+    return decoder.path, spins, decoder.decode(spins)
+
+def frame_spins(data):
+    """(path, raw spins) of a frame without decoding records again"""
+    decoder = _spin_decoder
+    spins = decoder.spins(data) if decoder is not None and isinstance(data, dict) else None
+    if spins is None:
+        return locate_spin_history(data)
+    return decoder.path, spins
+
+def format_spin_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+# ================= DAILY SPIN ARCHIVES =================
+_pyarrow = False  # Not probed yet
+
+def load_pyarrow():
+    """Import pyarrow on first use; None when it is not installed (CSV fallback)"""
+    global _pyarrow
+    if _pyarrow is False:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            _pyarrow = pyarrow
+        except ImportError:
+            _pyarrow = None
+    return _pyarrow
+
+ARCHIVE_COLUMNS = ["spin_id", "captured_at", "bet", "win", "fish", "multiplier"]
+ARCHIVE_FLOAT_COLUMNS = {"bet", "win", "multiplier"}
+
+def append_spin_journal(records, captured_at=None):
+    """Append decoded spins to today's (IST) journal for the nightly rollup"""
+    if not records:
+        return
+    captured_at = captured_at or get_ist_time()
+    os.makedirs(SPIN_JOURNAL_DIR, exist_ok=True)
+    journal = os.path.join(SPIN_JOURNAL_DIR, captured_at.strftime("%Y-%m-%d") + ".jsonl")
+    stamp = captured_at.isoformat(timespec="seconds")
+    with open(journal, "a", encoding="utf-8") as f:
+        for record in records:
+            row = record.to_dict()
+            row["captured_at"] = stamp
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def archive_path(day: str):
+    """Existing archive for an IST day (YYYY-MM-DD), Parquet preferred"""
+    for ext in (".parquet", ".csv.gz"):
+        path = os.path.join(ARCHIVE_DIR, f"spins_{day}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def read_spin_journal(day: str, columns=None):
+    """Deduplicated columns (dict of lists) from one IST day's journal"""
+    columns = list(columns) if columns else list(ARCHIVE_COLUMNS)
+    result = {name: [] for name in columns}
+    seen = set()
+    with open(os.path.join(SPIN_JOURNAL_DIR, f"{day}.jsonl"), "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn write from an interrupted run
+            if row.get("spin_id") in seen:
+                continue
+            seen.add(row.get("spin_id"))
+            for name in columns:
+                value = row.get(name)
+                if name == "fish" and value is not None:
+                    value = str(value)
+                result[name].append(value)
+    return result
+
+def rollup_day(day: str):
+    """Compact one IST day's journal into a deduplicated columnar archive"""
+    columns = read_spin_journal(day)
+    count = len(columns["spin_id"])
+    
+    pyarrow = load_pyarrow()
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    if pyarrow is not None:
+        path = os.path.join(ARCHIVE_DIR, f"spins_{day}.parquet")
+        schema = pyarrow.schema([(name, pyarrow.float64() if name in ARCHIVE_FLOAT_COLUMNS else pyarrow.string())
+                                 for name in ARCHIVE_COLUMNS])
+        table = pyarrow.table(columns, schema=schema)
+        pyarrow.parquet.write_table(table, path + ".tmp", compression="zstd")
+    else:
+        path = os.path.join(ARCHIVE_DIR, f"spins_{day}.csv.gz")
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(ARCHIVE_COLUMNS)
+            writer.writerows(zip(*(columns[name] for name in ARCHIVE_COLUMNS)))
+    os.replace(path + ".tmp", path)
+    return path, count
+
+def rollup_pending_days(include_today: bool = False):
+    """Archive every journaled IST day and prune its journal (today is still open).
+    
+    include_today writes a provisional archive for today but keeps its journal,
+    so the day is rolled up again once it is over.
+    """
+    try:
+        journals = sorted(n[:-len(".jsonl")] for n in os.listdir(SPIN_JOURNAL_DIR) if n.endswith(".jsonl"))
+    except FileNotFoundError:
+        return []
+    
+    today = format_ist_time(format_str="%Y-%m-%d")
+    archived = []
+    for day in journals:
+        if day >= today and not include_today:
+            continue
+        try:
+            path, count = rollup_day(day)
+            archived.append(path)
+            if day < today:
+                os.remove(os.path.join(SPIN_JOURNAL_DIR, f"{day}.jsonl"))
+            print_and_notify(f"📦 Archived {count} spins for {day} → {path}", "INFO", send_to_telegram=False)
+        except Exception as e:
+            print_and_notify(f"Spin archive rollup failed for {day}: {str(e)[:100]}", "WARNING", send_to_telegram=False)
+    return archived
+
+def read_spin_archive(path: str, columns=None):
+    """Read selected columns of one archive.
+    
+    Parquet archives are memory-mapped and return a pyarrow.Table; the CSV
+    fallback returns a dict of column -> list.
+    """
+    columns = list(columns) if columns else list(ARCHIVE_COLUMNS)
+    if path.endswith(".parquet"):
+        pyarrow = load_pyarrow()
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is required to read Parquet archives")
+        return pyarrow.parquet.read_table(path, columns=columns, memory_map=True)
+    
+    result = {name: [] for name in columns}
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            for name in columns:
+                value = row.get(name) or None
+                result[name].append(to_float(value) if name in ARCHIVE_FLOAT_COLUMNS else value)
+    return result
+
+def read_spin_archives(start_day: str, end_day: str, columns=None):
+    """Read selected columns for an inclusive IST day range (YYYY-MM-DD).
+    
+    Days whose journal is still open (today, or not rolled up yet) are read
+    from the journal, which is newer than any provisional archive.
+    """
+    start = datetime.strptime(start_day, "%Y-%m-%d").date()
+    end = datetime.strptime(end_day, "%Y-%m-%d").date()
+    parts = []
+    day = start
+    while day <= end:
+        path = archive_path(day.isoformat())
+        if os.path.exists(os.path.join(SPIN_JOURNAL_DIR, f"{day.isoformat()}.jsonl")):
+            parts.append(read_spin_journal(day.isoformat(), columns))
+        elif path:
+            parts.append(read_spin_archive(path, columns))
+        day += timedelta(days=1)
+    
+    pyarrow = load_pyarrow() if parts else None
+    if parts and pyarrow is not None and all(isinstance(p, pyarrow.Table) for p in parts):
+        return pyarrow.concat_tables(parts)
+    
+    merged = {name: [] for name in (list(columns) if columns else ARCHIVE_COLUMNS)}
+    for part in parts:
+        if pyarrow is not None and isinstance(part, pyarrow.Table):
+            part = part.to_pydict()
+        for name in merged:
+            merged[name].extend(part[name])
+    return merged
+
+# ================= SPIN DEDUP INDEX =================
+class SpinDedupIndex:
+    """Persistent set of delivered spin IDs stored as sorted 64-bit hashes.
+    
+    The file is a plain native-endian uint64 array, memory-mapped and searched
+    with bisect, so lookups stay O(log n) at millions of entries (8 bytes
+    each). New IDs are held in memory until commit() merges them in.
+    """
+    
+    def __init__(self, filename: str = SPIN_INDEX_FILE):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.file = None
+        self.map = None
+        self.keys = array("Q")
+        self._open()
+    
+    @staticmethod
+    def key(spin_id: str) -> int:
+        digest = hashlib.blake2b(spin_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, sys.byteorder)
+    
+    def _open(self):
+        self._close()
+        if not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0:
+            return
+        size = os.path.getsize(self.filename)
+        if size % self.keys.itemsize:
+            # Not written by commit() (always whole keys): set it aside and start over
+            corrupt = self.filename + ".corrupt"
+            os.replace(self.filename, corrupt)
+            print_and_notify(f"Spin index {self.filename} is corrupt ({size} bytes) - moved to {corrupt}, "
+                             f"starting a new index", "WARNING")
+            return
+        self.file = open(self.filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.keys = memoryview(self.map).cast("Q")
+    
+    def _close(self):
+        if isinstance(self.keys, memoryview):
+            self.keys.release()
+        self.keys = array("Q")
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+    
+    def __len__(self):
+        return len(self.keys) + len(self.pending)
+    
+    def _stored(self, key):
+        i = bisect.bisect_left(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+    
+    def __contains__(self, spin_id):
+        key = self.key(spin_id)
+        with self.lock:
+            return key in self.pending or self._stored(key)
+    
+    def add(self, spin_ids):
+        with self.lock:
+            for spin_id in spin_ids:
+                key = self.key(spin_id)
+                if not self._stored(key):
+                    self.pending.add(key)
+    
+    def commit(self):
+        """Merge pending IDs into the on-disk index (atomic replace)"""
+        with self.lock:
+            if not self.pending:
+                return
+            merged = array("Q", heapq.merge(self.keys, sorted(self.pending)))
+            tmp_file = self.filename + ".tmp"
+            with open(tmp_file, "wb") as f:
+                merged.tofile(f)
+            self._close()
+            os.replace(tmp_file, self.filename)
+            self.pending.clear()
+            self._open()
+            metrics.set("spin_index_size", len(self.keys))
+
 # ================= SPIN HISTORY MANAGER =================
 class SpinHistoryManager:
     """Manages spin history JSON files with IST timestamp in filename"""
     
-    def __init__(self):
+    def __init__(self, delivery_mode=DELIVERY_MODE):
         self.latest_file = None
         self.last_send_time = 0
         self.min_send_interval = 30  # Minimum 30 seconds between file sends
+        self.delivery_mode = delivery_mode
+        self.state = self._load_state()
+        self.pending = None  # Manifest entry for the file awaiting upload
+        self.nothing_new = False
+        self.index = SpinDedupIndex()
+        
+        # Carry over the ID list kept by older versions of the state file
+        legacy_ids = self.state.pop("delivered_ids", None)
+        if legacy_ids and not len(self.index):
+            self.index.add(legacy_ids)
+            self.index.commit()
+    
+    def _load_state(self):
+        """Load delivery state (delta counters)"""
+        state = {"deltas_since_full": 0, "last_full_time": 0}
+        try:
+            with open(SPIN_STATE_FILE, "r", encoding="utf-8") as f:
+                state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read delivery state {SPIN_STATE_FILE}: {e}", extra=NO_TELEGRAM)
+        return state
+    
+    def _save_state(self):
+        tmp_file = SPIN_STATE_FILE + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_file, SPIN_STATE_FILE)
+    
+    def _next_kind(self):
+        """Decide whether the next upload is a full snapshot or a delta"""
+        if self.delivery_mode != "delta" or not len(self.index):
+            return "full"
+        if self.state["deltas_since_full"] >= FULL_SNAPSHOT_EVERY:
+            return "full"
+        if time.time() - self.state["last_full_time"] >= FULL_SNAPSHOT_INTERVAL:
+            return "full"
+        return "delta"
         
-    def save_spin_data(self, data):
+    def save_spin_data(self, data, records=None, trace=None):
         """Save spin data to JSON file with IST timestamp in filename"""
+        self.nothing_new = False
         try:
+            if records is None:
+                path, spins, records = decode_spin_frame(data)
+            else:
+                path, spins = frame_spins(data)
+            frame_ids = [record.spin_id for record in records]
+            is_new = [spin_id not in self.index for spin_id in frame_ids]
+            
+            if frame_ids and not any(is_new) and (SPIN_DEDUP or self.delivery_mode == "delta"):
+                self.nothing_new = True
+                print_and_notify("No new spins since last upload - nothing to send", "INFO")
+                return None
+            
+            if SPIN_DEDUP:
+                append_spin_journal([r for r, new in zip(records, is_new) if new])
+            else:
+                append_spin_journal(records)
+            
+            kind = self._next_kind() if spins is not None else "full"
+            if kind == "full" and SPIN_DEDUP and self.delivery_mode != "delta" and spins is not None \
+                    and not all(is_new):
+                # Only genuinely new spins are delivered; periodic full snapshots
+                # are a delta-mode option
+                kind = "delta"
+            payload = data
+            file_ids = frame_ids
+            
+            if kind == "delta":
+                new_spins = [spin for spin, new in zip(spins, is_new) if new]
+                file_ids = [spin_id for spin_id, new in zip(frame_ids, is_new) if new]
+                payload = replace_spin_history(data, path, new_spins)
+            
             # Create filename with IST timestamp
             timestamp = get_filename_timestamp()
-            self.latest_file = f"spinHistory_{timestamp}.json"
+            prefix = "spinHistory_delta" if kind == "delta" else "spinHistory"
+            # The previous file is obsolete once delivered or spooled (the outbox keeps
+            # its own copy); otherwise a daemon would leave one file per capture
+            previous = self.latest_file if self.pending is None else None
+            self.latest_file = f"{prefix}_{timestamp}.json"
             
             with open(self.latest_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                json.dump(payload, f, indent=2, ensure_ascii=False)
+            
+            if previous and previous != self.latest_file and os.path.exists(previous):
+                os.remove(previous)
+            
+            self.pending = {
+                "file": self.latest_file,
+                "kind": kind,
+                "spin_ids": file_ids,
+                "frame_ids": frame_ids,
+                "trace_id": trace.trace_id if trace else None,
+            }
             
-            print_and_notify(f"Spin history saved to {self.latest_file}", "SUCCESS")
+            print_and_notify(f"Spin history saved to {self.latest_file} ({kind}, {len(file_ids)} spins)", "SUCCESS")
             return self.latest_file
             
         except Exception as e:
             print_and_notify(f"Error saving spin data: {str(e)[:100]}", "ERROR")
             return None
     
-    def send_to_telegram(self, filename, summary=None):
-        """Send file to Telegram with rate limiting"""
-        current_time = time.time()
+    def _commit_delivery(self, filename):
+        """Record a successful upload in the manifest and delivery state"""
+        entry = self.pending
+        if not entry or entry["file"] != filename:
+            return
+        self.pending = None
         
-        # Check if enough time has passed since last send
-        if current_time - self.last_send_time < self.min_send_interval:
+        try:
+            with open(SPIN_MANIFEST_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "file": os.path.basename(filename),
+                    "kind": entry["kind"],
+                    "sent_at": format_ist_time(),
+                    "trace_id": entry["trace_id"],
+                    "spin_count": len(entry["spin_ids"]),
+                    "spin_ids": entry["spin_ids"],
+                }, ensure_ascii=False) + "\n")
+            
+            self.index.add(entry["frame_ids"])
+            self.index.commit()
+            if entry["kind"] == "full":
+                self.state["deltas_since_full"] = 0
+                self.state["last_full_time"] = time.time()
+            else:
+                self.state["deltas_since_full"] += 1
+            self._save_state()
+        except Exception as e:
+            print_and_notify(f"Error updating delivery manifest: {str(e)[:100]}", "WARNING")
+    
+    def send_to_telegram(self, filename, summary=None, trace=None):
+        """Send file to Telegram with rate limiting"""
+        current_time = time.time()
+        
+        # Check if enough time has passed since last send
+        if current_time - self.last_send_time < self.min_send_interval:
             print_and_notify(f"Rate limiting: Waiting before sending next file", "DEBUG")
             return False
             
@@ -297,18 +1645,35 @@ class SpinHistoryManager:
             ist_date = format_ist_date()
             ist_time = format_ist_time_12hr()
             
+            kind_line = ""
+            if self.pending and self.pending["file"] == filename:
+                kind = "Delta" if self.pending["kind"] == "delta" else "Full snapshot"
+                kind_line = f"\n• Contents: {kind} ({len(self.pending['spin_ids'])} spins)"
+            
             file_caption = f"""🎰 <b>Spin History</b>
 ━━━━━━━━━━━━━━━━━━━━
 {summary}
 • Date: {ist_date}
-• Time: {ist_time} IST
+• Time: {ist_time} IST{kind_line}
 ━━━━━━━━━━━━━━━━━━━━"""
             
             # Send file
+            if trace:
+                trace.mark("upload_start")
             result = tg.send_file(filename, file_caption)
+            if trace and result and result.get("ok"):
+                trace.mark("upload_ack")
             
-            if result:
+            if result and result.get("queued"):
+                # Spooled to disk; the outbox delivers it once Telegram is reachable
                 self.last_send_time = current_time
+                self._commit_delivery(filename)
+                print_and_notify(f"Telegram unavailable - spin history queued for delivery: {filename}", "WARNING",
+                                 send_to_telegram=False)
+                return True
+            elif result and result.get("ok"):
+                self.last_send_time = current_time
+                self._commit_delivery(filename)
                 print_and_notify(f"Spin history file sent: {filename}", "SUCCESS")
                 
                 # Also send notification to log channel
@@ -321,7 +1686,8 @@ class SpinHistoryManager:
                 print_and_notify(log_notification, "INFO", chat_id_override=LOG_CHAT_ID)
                 return True
             else:
-                print_and_notify(f"Failed to send file: {filename}", "WARNING")
+                reason = f" ({result.get('description', '')[:100]})" if result else ""
+                print_and_notify(f"Failed to send file: {filename}{reason}", "WARNING")
                 return False
                 
         except Exception as e:
@@ -341,19 +1707,23 @@ class SpinHistoryManager:
             except:
                 pass
 
-# Initialize spin history manager
-spin_manager = SpinHistoryManager()
+# Spin history manager, built by init_runtime() for the capture and replay commands
+spin_manager = None
 
 # ================= IMPROVED LOGIN FUNCTION =================
 def step1_login(page):
+    from playwright.sync_api import TimeoutError
     print_and_notify("Starting login process...", "INFO")
     
-    max_retries = 3
+    policy, breaker = retry_policies["login"], breakers["login"]
+    max_retries = policy.max_attempts
     for attempt in range(max_retries):
+        # Fail fast while the login site is known to be down
+        breaker.check()
         try:
             print_and_notify(f"Login attempt {attempt + 1}/{max_retries}", "DEBUG", send_to_telegram=False)
             
-            page.goto("https://ind.55ace.com/login", timeout=180000, wait_until="domcontentloaded")
+            page.goto(LOGIN_URL, timeout=180000, wait_until="domcontentloaded")
             print_and_notify("Login page loaded", "DEBUG", send_to_telegram=False)
             
             page.wait_for_selector('input[autocomplete="username"]', timeout=30000)
@@ -376,12 +1746,14 @@ def step1_login(page):
             try:
                 page.wait_for_url("**/home**", timeout=45000, wait_until="domcontentloaded")
                 print_and_notify("Redirected to home page", "SUCCESS")
+                breaker.record_success()
                 break
                 
             except TimeoutError:
                 try:
                     page.wait_for_selector('img[src*="avatar"]', timeout=10000)
                     print_and_notify("User avatar detected - login successful", "SUCCESS")
+                    breaker.record_success()
                     break
                     
                 except TimeoutError:
@@ -390,28 +1762,32 @@ def step1_login(page):
                         error_text = error_msg.text_content()[:100]
                         print_and_notify(f"Login error: {error_text}", "ERROR")
                         if attempt < max_retries - 1:
-                            time.sleep(5)
+                            policy.failed(attempt, breaker)
                             continue
                     else:
                         current_url = page.url
                         if "login" not in current_url:
                             print_and_notify(f"Redirected to: {current_url[:50]}...", "SUCCESS")
+                            breaker.record_success()
                             break
                         
                         if attempt < max_retries - 1:
                             print_and_notify(f"Retrying login... ({attempt + 1}/{max_retries})", "WARNING")
                             page.reload()
-                            time.sleep(3)
+                            policy.failed(attempt, breaker)
                             continue
                         else:
                             raise Exception("Login failed after multiple attempts")
                             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             if attempt < max_retries - 1:
                 print_and_notify(f"Login attempt {attempt + 1} failed: {str(e)[:100]}", "WARNING")
-                time.sleep(5)
+                policy.failed(attempt, breaker)
                 continue
             else:
+                breaker.record_failure()
                 raise
     
     print_and_notify("Login completed", "SUCCESS")
@@ -474,8 +1850,11 @@ def step3_click_casino(page):
 def step4_click_evolution(page):
     print_and_notify("Selecting Evolution games...", "INFO")
     
-    max_retries = 3
+    policy, breaker = retry_policies["lobby"], breakers["lobby"]
+    max_retries = policy.max_attempts
     for attempt in range(max_retries):
+        # Fail fast while the provider lobby is known to be down
+        breaker.check()
         try:
             print_and_notify(f"Evolution selection attempt {attempt + 1}/{max_retries}", "DEBUG", send_to_telegram=False)
             
@@ -617,6 +1996,7 @@ def step4_click_evolution(page):
             
             if result.get("success"):
                 print_and_notify(f"Evolution clicked via {result.get('method', 'unknown method')}", "SUCCESS")
+                breaker.record_success()
                 
                 # Wait for page to respond
                 page.wait_for_timeout(3000)
@@ -659,17 +2039,21 @@ def step4_click_evolution(page):
                     
                     # Reload or go back
                     page.reload()
+                    policy.failed(attempt, breaker, sleep=False)
                     page.wait_for_timeout(3000)
                     continue
                 else:
                     raise Exception(f"Evolution not found after {max_retries} attempts. {error_msg}")
                     
+        except CircuitOpenError:
+            raise
         except Exception as e:
             if attempt < max_retries - 1:
                 print_and_notify(f"Attempt {attempt + 1} failed: {str(e)[:100]}", "WARNING")
-                time.sleep(3)
+                policy.failed(attempt, breaker)
                 continue
             else:
+                breaker.record_failure()
                 raise Exception(f"Failed to select Evolution: {str(e)}")
 
 def step5_wait_evolution(page, timeout=90):
@@ -703,6 +2087,258 @@ def step5_wait_evolution(page, timeout=90):
     
     raise Exception("Evolution platform timeout - launcher.php not detected")
 
+# Game socket seen by the browser, used to hand capture over to a native client
+game_socket = {"url": None, "ws": None, "handshakes": {}, "closed": False}
+
+def is_game_socket(url):
+    lowered = url.lower()
+    return "icefishing" in lowered or "evo" in urlparse(lowered).netloc
+
+def parse_game_frame(frame):
+    """Decode a frame and parse it if it carries spin history.
+    
+    Returns ("spin", data), ("error", message) or None for frames to ignore.
+    Kept free of shared state so it can also run in a worker process.
+    """
+    # Convert bytes to string for checking
+    if isinstance(frame, bytes):
+        frame_str = frame.decode('utf-8', errors='ignore')
+    else:
+        frame_str = str(frame)
+    
+    if not frame_str or len(frame_str) < 100:
+        return None
+    
+    if "icefishing.spinHistory" not in frame_str:
+        return None
+    
+    try:
+        # Try to parse as JSON
+        return ("spin", json.loads(frame_str))
+    except json.JSONDecodeError as e:
+        return ("error", f"JSON decode error: {str(e)[:100]}")
+
+def timed_parse_game_frame(frame):
+    """parse_game_frame plus the monotonic time parsing finished"""
+    return parse_game_frame(frame), time.monotonic()
+
+# Frame lanes for different sockets run concurrently; storing and delivering
+# is serialised so two frames can't both upload or clobber the pending entry
+spin_frame_lock = threading.Lock()
+
+def process_spin_frame(data, trace=None, complete_run=True):
+    """Store, summarise and deliver one parsed spinHistory frame.
+    
+    complete_run=False (daemon captures) delivers without ending the run.
+    Returns True once sent or queued, None when there was nothing new to send
+    and False when storing or sending failed.
+    """
+    with spin_frame_lock:
+        return _process_spin_frame(data, trace, complete_run)
+
+def _process_spin_frame(data, trace, complete_run):
+    global script_completed
+    
+    # Check if script should exit (already sent first file); re-checked under
+    # the lock because another socket's frame may have completed the run
+    if script_completed:
+        return None
+    
+    if trace is None:
+        trace = SpinTrace()
+        trace.mark("parsed")
+    print_and_notify(f"🎣 Spin history data detected! (trace {trace.trace_id})", "SUCCESS")
+    metrics.incr("spin_history_frames")
+    
+    try:
+        # Decode once; file storage and the summary share the same records
+        _, _, records = decode_spin_frame(data)
+        
+        # Save to JSON file with IST timestamp
+        saved_file = spin_manager.save_spin_data(data, records, trace)
+        trace.mark("stored")
+        
+        if saved_file:
+            # Extract summary for log
+            summary = extract_spin_summary(data, records)
+            trace.mark("summarized")
+            print_and_notify(summary, "INFO")
+            
+            # Send file with rate limiting
+            sent = spin_manager.send_to_telegram(saved_file, summary, trace)
+            
+            if not complete_run:
+                return sent
+            
+            # Set completion flag instead of sys.exit(0)
+            script_completed = True
+            print_and_notify("✅ First spin history sent - exiting script", "SUCCESS")
+            return sent
+        
+        if not spin_manager.nothing_new:
+            return False
+        if complete_run:
+            # Every spin in the frame was delivered before - this run is done as well
+            script_completed = True
+        return None
+        
+    except Exception as e:
+        error_msg = f"Error processing spinHistory: {str(e)[:200]}"
+        print_and_notify(error_msg, "ERROR")
+        return False
+    finally:
+        trace.finish()
+
+def deliver_parsed_frame(result, received_at=None, parsed_at=None):
+    """Act on the output of parse_game_frame"""
+    if result is None:
+        return
+    kind, value = result
+    if kind == "error":
+        print_and_notify(value, "WARNING")
+    elif DAEMON_MODE:
+        # Daemon captures run on their schedule; just keep the newest frame
+        spin_frame_cache.store(value)
+    else:
+        trace = SpinTrace(received_at)
+        trace.mark("parsed", parsed_at)
+        process_spin_frame(value, trace)
+
+def handle_game_frame(frame):
+    """Process one WebSocket frame payload (str or bytes) synchronously"""
+    if script_completed:
+        return
+    try:
+        received_at = time.monotonic()
+        result, parsed_at = timed_parse_game_frame(frame)
+        deliver_parsed_frame(result, received_at, parsed_at)
+    except Exception as e:
+        error_msg = f"Error processing WebSocket frame: {str(e)[:200]}"
+        print_and_notify(error_msg, "ERROR")
+
+# ================= FRAME WORKER POOL =================
+class FrameProcessor:
+    """Moves frame parsing and processing off the event-dispatch thread.
+    
+    Frames are parsed on a thread pool (or a process pool for very large
+    frames) and their results are delivered strictly in arrival order per
+    socket, so the dispatch thread only has to copy the payload.
+    """
+    
+    def __init__(self, workers: int = FRAME_WORKERS, process_threshold: int = FRAME_PROCESS_THRESHOLD):
+        # workers=0 keeps the old behaviour of processing on the dispatch thread
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame") if workers > 0 else None
+        self.process_threshold = process_threshold
+        self.process_pool = None
+        self.lock = threading.Lock()
+        self.lanes = {}  # socket -> {"queue": deque, "delivering": bool}
+        self.depth = 0
+    
+    def submit(self, frame, socket_key: str = "default"):
+        """Called from the dispatch thread: copy the payload, queue it and return"""
+        if script_completed:
+            return
+        if self.executor is None:
+            metrics.incr("frames_received", socket=socket_key)
+            metrics.set("last_frame_time", time.time())
+            handle_game_frame(frame)
+            return
+        payload = bytes(frame) if isinstance(frame, (bytes, bytearray, memoryview)) else frame
+        received = time.monotonic()
+        metrics.incr("frames_received", socket=socket_key)
+        metrics.set("last_frame_time", time.time())
+        
+        if self.process_threshold and len(payload) >= self.process_threshold:
+            if self.process_pool is None:
+                self.process_pool = ProcessPoolExecutor(max_workers=1)
+            future = self.process_pool.submit(timed_parse_game_frame, payload)
+        else:
+            future = self.executor.submit(timed_parse_game_frame, payload)
+        
+        with self.lock:
+            lane = self.lanes.setdefault(socket_key, {"queue": deque(), "delivering": False})
+            lane["queue"].append((future, received))
+            self.depth += 1
+            metrics.set("frame_queue_depth", self.depth)
+        future.add_done_callback(lambda _: self._schedule_drain(lane))
+    
+    def _schedule_drain(self, lane):
+        # Always hop to a worker: the callback may run on the dispatch thread
+        # if parsing finished before it was attached
+        try:
+            self.executor.submit(self._drain_lane, lane)
+        except RuntimeError:
+            self._drain_lane(lane)  # Executor shutting down
+    
+    def _drain_lane(self, lane):
+        """Deliver finished results from the head of a lane, in order"""
+        with self.lock:
+            if lane["delivering"]:
+                return  # The thread already delivering will pick this up
+            lane["delivering"] = True
+        
+        try:
+            while True:
+                with self.lock:
+                    if not lane["queue"] or not lane["queue"][0][0].done():
+                        lane["delivering"] = False
+                        return
+                    future, received = lane["queue"].popleft()
+                    self.depth -= 1
+                    metrics.set("frame_queue_depth", self.depth)
+                
+                try:
+                    result, parsed_at = future.result()
+                    deliver_parsed_frame(result, received, parsed_at)
+                except Exception as e:
+                    print_and_notify(f"Error processing WebSocket frame: {str(e)[:200]}", "ERROR")
+                
+                lag_ms = round((time.monotonic() - received) * 1000, 1)
+                metrics.set("frame_processing_lag_ms", lag_ms)
+                metrics.set_max("frame_processing_lag_max_ms", lag_ms)
+        except Exception:
+            with self.lock:
+                lane["delivering"] = False
+            raise
+    
+    def shutdown(self, wait: bool = True):
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=wait)
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+
+# Frame worker pool, built by init_runtime()
+frame_processor = None
+
+def init_runtime():
+    """Create the notifier, spin manager and frame worker pool used by live captures"""
+    global spin_manager, frame_processor
+    init_telegram()
+    if spin_manager is None:
+        spin_manager = SpinHistoryManager()
+    if frame_processor is None:
+        frame_processor = FrameProcessor()
+
+def capture_handshake_headers(page):
+    """Record the game socket's handshake request headers via CDP"""
+    socket_urls = {}
+    
+    def on_created(params):
+        socket_urls[params.get("requestId")] = params.get("url", "")
+    
+    def on_handshake(params):
+        url = socket_urls.get(params.get("requestId"))
+        if url:
+            game_socket["handshakes"][url] = params.get("request", {}).get("headers", {})
+    
+    try:
+        session = page.context.new_cdp_session(page)
+        session.send("Network.enable")
+        session.on("Network.webSocketCreated", on_created)
+        session.on("Network.webSocketWillSendHandshakeRequest", on_handshake)
+    except Exception as e:
+        print_and_notify(f"Handshake header capture unavailable: {str(e)[:100]}", "DEBUG", send_to_telegram=False)
+
 def step6_attach_ws(page):
     print_and_notify("Attaching WebSocket listener...", "INFO")
     
@@ -710,57 +2346,26 @@ def step6_attach_ws(page):
         ws_url = ws.url.split('?')[0] if '?' in ws.url else ws.url
         print_and_notify(f"WebSocket connected → {ws_url}", "SUCCESS")
         
-        def on_frame(frame):
-            global script_completed
-            try:
-                # Convert bytes to string for checking
-                if isinstance(frame, bytes):
-                    frame_str = frame.decode('utf-8', errors='ignore')
-                else:
-                    frame_str = str(frame)
-                
-                if not frame_str or len(frame_str) < 100:
-                    return
-                
-                # Check if script should exit (already sent first file)
-                global script_completed
-                if script_completed:
-                    return
-                
-                if "icefishing.spinHistory" in frame_str:
-                    print_and_notify("🎣 Spin history data detected!", "SUCCESS")
-                    
-                    try:
-                        # Try to parse as JSON
-                        data = json.loads(frame_str)
-                        
-                        # Save to JSON file with IST timestamp
-                        saved_file = spin_manager.save_spin_data(data)
-                        
-                        if saved_file:
-                            # Extract summary for log
-                            summary = extract_spin_summary(data)
-                            print_and_notify(summary, "INFO")
-                            
-                            # Send file with rate limiting
-                            spin_manager.send_to_telegram(saved_file, summary)
-                            
-                            # Set completion flag instead of sys.exit(0)
-                            script_completed = True
-                            print_and_notify("✅ First spin history sent - exiting script", "SUCCESS")
-                            return  # Exit the frame handler
-                        
-                    except json.JSONDecodeError as e:
-                        print_and_notify(f"JSON decode error: {str(e)[:100]}", "WARNING")
-                    except Exception as e:
-                        error_msg = f"Error processing spinHistory: {str(e)[:200]}"
-                        print_and_notify(error_msg, "ERROR")
-                        
-            except Exception as e:
-                error_msg = f"Error processing WebSocket frame: {str(e)[:200]}"
-                print_and_notify(error_msg, "ERROR")
+        # Remember the game socket (prefer the icefishing one over other evo sockets)
+        if is_game_socket(ws.url):
+            current = game_socket["url"] or ""
+            if "icefishing" not in current.lower() or "icefishing" in ws.url.lower():
+                game_socket["url"] = ws.url
+                game_socket["ws"] = ws
+                game_socket["closed"] = False
         
-        ws.on("framereceived", on_frame)
+        def on_close(_):
+            # Identity, not URL: a retired page's socket may share the game URL
+            if ws is game_socket["ws"]:
+                game_socket["closed"] = True
+                metrics.incr("game_socket_closed")
+        
+        ws.on("close", on_close)
+        
+        ws.on("framereceived", lambda frame: frame_processor.submit(frame, ws_url))
+    
+    if DIRECT_WS_MODE:
+        capture_handshake_headers(page)
     
     page.on("websocket", handle_ws)
     print_and_notify("WebSocket listener ready", "SUCCESS")
@@ -793,48 +2398,36 @@ def step7_open_ice_fishing(page):
     
 
 
-def extract_spin_summary(data):
+SUMMARY_FIELDS = [
+    ('💰 Bet', 'bet'),
+    ('🎁 Win', 'win'),
+    ('🎣 Fish', 'fish'),
+    ('⭐ Multiplier', 'multiplier'),
+]
+
+def extract_spin_summary(data, records=None):
     try:
-        if isinstance(data, dict):
-            spin_data = None
-            
-            if 'data' in data and 'spinHistory' in data['data']:
-                spin_data = data['data']['spinHistory']
-            elif 'spinHistory' in data:
-                spin_data = data['spinHistory']
-            elif 'history' in data:
-                spin_data = data['history']
-            
-            if spin_data and isinstance(spin_data, list) and len(spin_data) > 0:
-                latest = spin_data[0]
-                summary = f"🎣 <b>Latest Spin Summary</b>\n"
-                summary += f"━━━━━━━━━━━━━━━━━━━━\n"
-                
-                fields = [
-                    ('💰 Bet', 'bet', 'stake', 'wager'),
-                    ('🎁 Win', 'win', 'payout', 'winnings'),
-                    ('🎣 Fish', 'fishCaught', 'fish', 'catch'),
-                    ('⭐ Multiplier', 'multiplier', 'mult'),
-                ]
-                
-                for display_name, *possible_keys in fields:
-                    value = None
-                    for key in possible_keys:
-                        if key in latest:
-                            value = latest[key]
-                            break
-                    
-                    if value is not None:
-                        summary += f"• <b>{display_name}:</b> {value}\n"
-                
-                if len(summary.split('\n')) <= 3:
-                    summary += f"• <b>Data:</b> Full JSON saved\n"
-                
-                # Use IST time
-                ist_timestamp = format_ist_time()
-                summary += f"━━━━━━━━━━━━━━━━━━━━\n"
-                summary += f"🕒 {ist_timestamp} IST"
-                return summary
+        if records is None:
+            _, _, records = decode_spin_frame(data)
+        
+        if records:
+            latest = records[0]
+            summary = f"🎣 <b>Latest Spin Summary</b>\n"
+            summary += f"━━━━━━━━━━━━━━━━━━━━\n"
+            
+            for display_name, field in SUMMARY_FIELDS:
+                value = latest.display(field)
+                if value is not None:
+                    summary += f"• <b>{display_name}:</b> {format_spin_value(value)}\n"
+            
+            if len(summary.split('\n')) <= 3:
+                summary += f"• <b>Data:</b> Full JSON saved\n"
+            
+            # Use IST time
+            ist_timestamp = format_ist_time()
+            summary += f"━━━━━━━━━━━━━━━━━━━━\n"
+            summary += f"🕒 {ist_timestamp} IST"
+            return summary
                 
         return "📊 Spin data received (awaiting analysis)"
         
@@ -867,8 +2460,696 @@ def attach_context_ws(context):
 
 
 
+# ================= DIRECT WEBSOCKET CAPTURE =================
+class WebSocketHandshakeError(Exception):
+    pass
+
+class DirectWebSocketClient:
+    """Minimal RFC 6455 client used to keep capturing without a browser"""
+    
+    GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+    OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+    
+    def __init__(self, url: str, headers: dict = None, timeout: int = 15):
+        self.url = url
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.sock = None
+        self.buffer = bytearray()
+        self.should_stop = lambda: False
+    
+    def connect(self):
+        """Open the TCP/TLS connection and perform the upgrade handshake"""
+        parsed = urlparse(self.url)
+        secure = parsed.scheme == "wss"
+        port = parsed.port or (443 if secure else 80)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        
+        sock = socket.create_connection((parsed.hostname, port), timeout=self.timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+        
+        key = base64.b64encode(os.urandom(16)).decode()
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {parsed.netloc}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+        ]
+        reserved = {"host", "upgrade", "connection", "sec-websocket-key",
+                    "sec-websocket-version", "sec-websocket-extensions"}
+        for name, value in self.headers.items():
+            if name.lower() not in reserved:
+                lines.append(f"{name}: {value}")
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8"))
+        
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                sock.close()
+                raise WebSocketHandshakeError("Connection closed during handshake")
+            response += chunk
+            if len(response) > 65536:
+                sock.close()
+                raise WebSocketHandshakeError("Handshake response too large")
+        
+        head, _, rest = response.partition(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        if " 101 " not in f"{status_line} ":
+            sock.close()
+            raise WebSocketHandshakeError(f"Unexpected handshake status: {status_line[:100]}")
+        
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        expected = base64.b64encode(hashlib.sha1((key + self.GUID).encode()).digest()).decode()
+        if response_headers.get("sec-websocket-accept") != expected:
+            sock.close()
+            raise WebSocketHandshakeError("Invalid Sec-WebSocket-Accept")
+        
+        sock.settimeout(1)  # Short timeout so the read loop can notice stop requests
+        self.sock = sock
+        self.buffer = bytearray(rest)
+    
+    def _recv_exact(self, size):
+        while len(self.buffer) < size:
+            try:
+                chunk = self.sock.recv(65536)
+            except socket.timeout:
+                if self.should_stop():
+                    raise
+                continue
+            if not chunk:
+                raise ConnectionError("WebSocket connection closed by server")
+            self.buffer.extend(chunk)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+    
+    def send_frame(self, opcode, payload: bytes = b""):
+        """Send a single masked frame (client frames must be masked)"""
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 65536:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", length)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.sock.sendall(bytes(header) + mask + masked)
+    
+    def recv_message(self):
+        """Next text (str) or binary (bytes) message, None once the server closes"""
+        fragments = []
+        message_opcode = None
+        while True:
+            first, second = self._recv_exact(2)
+            fin = first & 0x80
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._recv_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._recv_exact(8))[0]
+            mask = self._recv_exact(4) if second & 0x80 else None
+            payload = self._recv_exact(length) if length else b""
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            
+            if opcode == self.OP_PING:
+                self.send_frame(self.OP_PONG, payload)
+                continue
+            if opcode == self.OP_PONG:
+                continue
+            if opcode == self.OP_CLOSE:
+                try:
+                    self.send_frame(self.OP_CLOSE, payload[:2])
+                except OSError:
+                    pass
+                return None
+            
+            if opcode != self.OP_CONT:
+                message_opcode = opcode
+            fragments.append(payload)
+            if fin:
+                data = b"".join(fragments)
+                if message_opcode == self.OP_TEXT:
+                    return data.decode("utf-8", errors="ignore")
+                return data
+    
+    def run(self, on_message, should_stop):
+        """Feed messages to on_message until should_stop() or the server closes"""
+        self.should_stop = should_stop
+        while not should_stop():
+            try:
+                message = self.recv_message()
+            except socket.timeout:
+                break
+            if message is None:
+                return False
+            on_message(message)
+        return True
+    
+    def close(self):
+        if self.sock:
+            try:
+                self.send_frame(self.OP_CLOSE, struct.pack("!H", 1000))
+            except OSError:
+                pass
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+def build_direct_socket_headers(context, page, url):
+    """Headers for replaying the game socket handshake outside the browser"""
+    headers = dict(game_socket["handshakes"].get(url, {}))
+    lowered = {name.lower() for name in headers}
+    
+    if "user-agent" not in lowered:
+        headers["User-Agent"] = page.evaluate("() => navigator.userAgent")
+    if "origin" not in lowered:
+        page_url = urlparse(page.url)
+        headers["Origin"] = f"{page_url.scheme}://{page_url.netloc}"
+    if "cookie" not in lowered:
+        http_url = "https" + url[3:] if url.startswith("wss") else "http" + url[2:]
+        cookies = context.cookies([http_url])
+        if cookies:
+            headers["Cookie"] = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+    return headers
+
+def start_direct_capture(context, page):
+    """Try to open the game socket natively, returns the client or None to stay on the browser"""
+    url = game_socket["url"]
+    if not url:
+        print_and_notify("No game socket captured - staying on browser capture", "WARNING")
+        return None
+    
+    try:
+        headers = build_direct_socket_headers(context, page, url)
+        client = DirectWebSocketClient(url, headers)
+        client.connect()
+    except Exception as e:
+        print_and_notify(f"Direct socket handshake failed, keeping browser: {str(e)[:100]}", "WARNING")
+        metrics.incr("direct_ws_fallbacks")
+        return None
+    
+    print_and_notify(f"🔌 Direct WebSocket connected → {url.split('?')[0]}", "SUCCESS")
+    metrics.incr("direct_ws_handovers")
+    return client
+
+def run_direct_capture(client, max_reconnects=3):
+    """Capture over the native client until the run completes"""
+    reconnects = 0
+    try:
+        while not script_completed:
+            if client.run(lambda message: frame_processor.submit(message, "direct"), lambda: script_completed):
+                return
+            if reconnects >= max_reconnects:
+                raise Exception("Direct WebSocket closed by server")
+            reconnects += 1
+            print_and_notify(f"Direct WebSocket closed - reconnecting ({reconnects}/{max_reconnects})", "WARNING")
+            client.close()
+            time.sleep(2)
+            client.connect()
+    finally:
+        client.close()
+
+# ================= BROWSER MEMORY CONTROLS =================
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+    "--window-size=1920,1080",
+    "--mute-audio"
+]
+
+# Extra flags for low-footprint capture: fewer renderer processes, no GPU,
+# no background services and a capped V8 heap
+LOW_MEMORY_ARGS = [
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--renderer-process-limit=2",
+    "--disable-features=site-per-process,IsolateOrigins,Translate,MediaRouter",
+    "--js-flags=--max-old-space-size=256",
+]
+
+# Images, media and fonts the game page never needs once its socket is open.
+# Blocked in the browser via CDP so no request waits on a Python route handler
+# (sync Playwright only runs those during API calls).
+BLOCKED_URL_PATTERNS = [
+    f"*.{ext}" for ext in ("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico",
+                           "mp3", "mp4", "m4a", "ogg", "wav", "webm",
+                           "woff", "woff2", "ttf", "otf")
+]
+
+def get_browser_args():
+    """Chromium launch arguments for the configured memory mode"""
+    if not LOW_MEMORY_MODE:
+        return list(BROWSER_ARGS)
+    args = [a for a in BROWSER_ARGS if not a.startswith("--window-size")]
+    return args + ["--window-size=1024,576"] + LOW_MEMORY_ARGS
+
+def get_viewport():
+    if LOW_MEMORY_MODE:
+        return {'width': 1024, 'height': 576}
+    return {'width': 1920, 'height': 1080}
+
+def browser_process_tree_rss():
+    """Total RSS (bytes) and process count of everything spawned by this script"""
+    if psutil is not None:
+        total = 0
+        children = psutil.Process().children(recursive=True)
+        for child in children:
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return total, len(children)
+    
+    # Fallback: walk /proc (Linux only)
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            # Fields after the command name, which may contain spaces
+            fields = stat[stat.rindex(")") + 2:].split()
+            parents.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total, count = 0, 0
+    pending = list(parents.get(os.getpid(), []))
+    while pending:
+        pid = pending.pop()
+        pending.extend(parents.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                total += int(f.read().split()[1]) * page_size
+            count += 1
+        except (OSError, ValueError, IndexError):
+            continue
+    return total, count
+
+def sample_browser_memory():
+    """Record the browser tree RSS in the run metrics, returns RSS in MB"""
+    try:
+        rss, processes = browser_process_tree_rss()
+    except Exception as e:
+        print_and_notify(f"Memory sampling failed: {str(e)[:100]}", "DEBUG", send_to_telegram=False)
+        return None
+    
+    rss_mb = round(rss / (1024 * 1024), 1)
+    metrics.sample("browser_rss_mb", rss_mb)
+    metrics.set("browser_rss_mb", rss_mb)
+    metrics.set("browser_processes", processes)
+    metrics.set_max("browser_rss_peak_mb", rss_mb)
+    return rss_mb
+
+def release_page_resources(context, page):
+    """Drop pages, caches and resource loads not needed once the game socket is up"""
+    released = 0
+    for other in list(context.pages):
+        if other is not page:
+            try:
+                other.close()
+                released += 1
+            except:
+                pass
+    
+    try:
+        # The session stays attached: the URL block list lives as long as it does
+        session = context.new_cdp_session(page)
+        session.send("Network.enable")
+        session.send("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        session.send("Network.clearBrowserCache")
+        session.send("Memory.simulatePressureNotification", {"level": "critical"})
+        session.send("HeapProfiler.collectGarbage")
+    except Exception as e:
+        print_and_notify(f"CDP memory release failed: {str(e)[:100]}", "DEBUG", send_to_telegram=False)
+    
+    print_and_notify(f"Released browser resources (closed {released} extra page(s))", "DEBUG", send_to_telegram=False)
+
+def recycle_game_page(session):
+    """Replace the session's game page with a fresh one to give its memory back"""
+    print_and_notify("♻️ Browser memory limit reached - recycling game page", "WARNING")
+    context, page = session["context"], session["page"]
+    new_page = new_capture_page(context, session)
+    game_socket.update(url=None, ws=None, closed=False)
+    step6_attach_ws(new_page)
+    step7_open_ice_fishing(new_page)
+    session.update(page=new_page, crashed=False, monitoring_since=time.time())
+    metrics.set("monitoring_since", session["monitoring_since"])
+    metrics.set("current_step", "Monitoring")
+    try:
+        page.close()
+    except:
+        pass
+    if LOW_MEMORY_MODE:
+        release_page_resources(context, new_page)
+    metrics.incr("page_recycles")
+    return new_page
+
+# ================= WARM BROWSER DAEMON =================
+def run_housekeeping(session):
+    """Periodic upkeep while waiting on the game page (may swap session page/context)"""
+    # Retry queued Telegram deliveries once their backoff expires
+    if not tg.outbox.in_backoff() and len(tg.outbox):
+        tg.outbox.drain(tg)
+    
+    # Archive finished days once per IST day boundary (long-running daemons)
+    today = format_ist_time(format_str="%Y-%m-%d")
+    if session.get("rollup_day") != today:
+        session["rollup_day"] = today
+        rollup_pending_days()
+    
+    # A crashed standby can't take over anything: park a fresh one
+    if session["standby"] and session.get("standby_crashed"):
+        replace_standby(session)
+    
+    # Hand over to the standby context if the active page died, hung or lost its socket
+    if session["standby"]:
+        problem = active_page_problem(session)
+        if problem:
+            failover_to_standby(session, problem)
+            return
+    
+    # Periodically sample browser memory and recycle the page if over the limit
+    if time.time() - session["last_memory_sample"] >= MEMORY_SAMPLE_INTERVAL:
+        session["last_memory_sample"] = time.time()
+        rss_mb = sample_browser_memory()
+        if BROWSER_MEMORY_LIMIT_MB and rss_mb and rss_mb > BROWSER_MEMORY_LIMIT_MB:
+            print_and_notify(f"Browser RSS {rss_mb} MB exceeds {BROWSER_MEMORY_LIMIT_MB} MB", "WARNING")
+            recycle_game_page(session)
+            session["last_memory_sample"] = time.time()
+
+class SpinFrameCache:
+    """Newest parsed spinHistory frame, kept for the next scheduled capture"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = None
+        self.received = 0
+        self.version = 0
+    
+    def store(self, data):
+        with self.lock:
+            self.data = data
+            self.received = time.time()
+            self.version += 1
+    
+    def latest(self):
+        with self.lock:
+            return self.data, self.received, self.version
+
+spin_frame_cache = SpinFrameCache()
+
+def parse_cron_field(field, low, high):
+    """Expand one cron field (*, */n, a, a/n, a-b, a-b/n, lists) into a set of values"""
+    values = set()
+    for part in field.split(","):
+        step = None
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step else start  # As in cron, a/n means a-high/n
+        step = 1 if step is None else step
+        if start < low or end > high or step < 1:
+            raise ValueError(f"Cron field out of range: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CaptureSchedule:
+    """Fixed interval or cron-like (minute hour day month weekday) schedule in IST"""
+    
+    def __init__(self, interval: int = CAPTURE_INTERVAL, cron: str = CAPTURE_CRON):
+        self.interval = interval
+        self.cron_expr = cron
+        self.cron = None
+        if cron:
+            fields = cron.split()
+            if len(fields) != 5:
+                raise ValueError(f"CAPTURE_CRON needs 5 fields, got: {cron}")
+            self.cron = (
+                sorted(parse_cron_field(fields[0], 0, 59)),
+                sorted(parse_cron_field(fields[1], 0, 23)),
+                parse_cron_field(fields[2], 1, 31),
+                parse_cron_field(fields[3], 1, 12),
+                {d % 7 for d in parse_cron_field(fields[4], 0, 7)},  # 0 and 7 are Sunday
+            )
+            # Cron fires on either day field when both are restricted (not "*...")
+            self.days_or = not fields[2].startswith("*") and not fields[4].startswith("*")
+    
+    def describe(self):
+        return f"cron '{self.cron_expr}' (IST)" if self.cron else f"every {self.interval}s"
+    
+    def day_matches(self, day) -> bool:
+        _, _, days, months, weekdays = self.cron
+        if day.month not in months:
+            return False
+        in_days, in_weekdays = day.day in days, (day.weekday() + 1) % 7 in weekdays
+        return (in_days or in_weekdays) if self.days_or else (in_days and in_weekdays)
+    
+    def next_run(self, after: datetime) -> datetime:
+        if self.cron is None:
+            return after + timedelta(seconds=self.interval)
+        minutes, hours = self.cron[:2]
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        # Eight years covers Feb 29 across a skipped century leap year
+        for _ in range(8 * 366):
+            if self.day_matches(day):
+                for hour in hours:
+                    for minute in minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError("Capture schedule never fires")
+
+def capture_snapshot(page, max_age: int, wait: int = 60):
+    """Deliver the newest spinHistory frame, reloading the game only if it is stale"""
+    data, received, version = spin_frame_cache.latest()
+    if data is None or time.time() - received > max_age:
+        print_and_notify("No fresh spin history cached - reloading game for a new frame", "DEBUG", send_to_telegram=False)
+        metrics.incr("daemon_game_reloads")
+        page.reload(wait_until="domcontentloaded")
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            page.wait_for_timeout(1000)
+            data, received, new_version = spin_frame_cache.latest()
+            if new_version != version:
+                break
+        else:
+            print_and_notify("Scheduled capture skipped - no spin history frame received", "WARNING")
+            metrics.incr("daemon_captures_missed")
+            return False
+    
+    trace = SpinTrace()
+    trace.mark("parsed")
+    process_spin_frame(data, trace, complete_run=False)
+    metrics.incr("daemon_captures")
+    return True
+
+def run_capture_daemon(session):
+    """Keep the game page warm and capture spin history on the configured schedule"""
+    schedule = CaptureSchedule()
+    max_age = CAPTURE_MAX_AGE or (schedule.interval if schedule.cron is None else 3600)
+    next_run = get_ist_time()  # First capture right away
+    print_and_notify(f"🕰 Daemon mode: capturing {schedule.describe()}", "INFO")
+    
+    while True:
+        # Waiting inside Playwright keeps WebSocket events flowing into the cache
+        wait_on_page(session)
+        run_housekeeping(session)
+        
+        if get_ist_time() < next_run:
+            continue
+        metrics.set("current_step", "Daemon capture")
+        try:
+            capture_snapshot(session["page"], max_age)
+        except Exception as e:
+            print_and_notify(f"Scheduled capture failed: {str(e)[:200]}", "ERROR")
+        metrics.set("current_step", "Daemon idle")
+        next_run = schedule.next_run(get_ist_time())
+        print_and_notify(f"Next capture at {format_ist_time(next_run)} IST", "DEBUG", send_to_telegram=False)
+
+# ================= STANDBY CONTEXT FAILOVER =================
+# Lobby steps bring a context to the Evolution lobby; game steps open the game
+LOBBY_STEPS = [
+    ("1. Login", step1_login),
+    ("2. Close Popups", step2_close_popup),
+    ("3. Open Casino", step3_click_casino),
+    ("4. Select Evolution", step4_click_evolution),
+]
+GAME_STEPS = [
+    ("6. Setup WebSocket", step6_attach_ws),
+    ("5. Load Platform", step5_wait_evolution),
+    ("7. Launch Game", step7_open_ice_fishing),
+]
+
+def new_capture_context(browser):
+    """Browser context with the monitor's fingerprint and IST timezone"""
+    # Set timezone to Asia/Kolkata (IST) for browser context
+    return browser.new_context(
+        viewport=get_viewport(),
+        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        locale='en-US',
+        timezone_id='Asia/Kolkata',  # Changed to IST timezone
+        ignore_https_errors=True
+    )
+
+def new_capture_page(context, session=None):
+    page = context.new_page()
+    page.set_default_timeout(90000)
+    if session is not None:
+        page.on("crash", lambda crashed_page: on_page_crash(session, crashed_page))
+    return page
+
+def on_page_crash(session, page):
+    """Attribute a renderer crash to the active page or the standby, never both"""
+    if page is session["page"]:
+        session["crashed"] = True
+        metrics.set("current_step", "Page crashed")
+    elif session["standby"] and page is session["standby"][1]:
+        session["standby_crashed"] = True
+        print_and_notify("Standby page crashed - it will be replaced", "WARNING")
+
+def wait_on_page(session, ms=1000):
+    """Idle inside Playwright: the sync API only dispatches events during its calls"""
+    page = session["page"]
+    if page is None or page.is_closed() or session.get("crashed"):
+        time.sleep(ms / 1000)  # Nothing to wait on; housekeeping replaces the page
+        return
+    page.wait_for_timeout(ms)
+
+def run_steps(page, steps, label=""):
+    for step_name, step_func in steps:
+        metrics.set("current_step", f"{label}{step_name}")
+        print_and_notify(f"Starting {label}{step_name}...", "INFO")
+        step_func(page)
+        print_and_notify(f"Completed {label}{step_name}", "SUCCESS")
+        
+        # Add delay between steps to reduce Telegram messages
+        if step_name != "7. Launch Game":
+            time.sleep(3)  # Increased from 2 to 3 seconds
+
+def prepare_standby(browser, session):
+    """Log a second context in and park it at the lobby, returns (context, page) or None"""
+    started = time.monotonic()
+    context = new_capture_context(browser)
+    try:
+        page = new_capture_page(context, session)
+        run_steps(page, LOBBY_STEPS, label="[standby] ")
+    except Exception as e:
+        print_and_notify(f"Standby context could not be prepared: {str(e)[:200]}", "WARNING")
+        try:
+            context.close()
+        except:
+            pass
+        return None
+    metrics.set("standby_ready", 1)
+    print_and_notify(f"🛟 Standby context parked at lobby ({time.monotonic() - started:.0f}s)", "SUCCESS")
+    return context, page
+
+def active_page_problem(session):
+    """Why the active game page needs replacing, or None if it looks healthy"""
+    page = session["page"]
+    if page is None or page.is_closed():
+        return "page closed"
+    if session.get("crashed"):
+        return "page crashed"
+    if game_socket["closed"]:
+        return "game socket lost"
+    last_frame = metrics.get("last_frame_time")
+    if session.get("monitoring_since") and SOCKET_IDLE_TIMEOUT:
+        idle_since = max(last_frame or 0, session["monitoring_since"])
+        if time.time() - idle_since > SOCKET_IDLE_TIMEOUT:
+            return f"no frames for {SOCKET_IDLE_TIMEOUT}s"
+    return None
+
+def replace_standby(session):
+    """Discard a crashed standby context and park a fresh one"""
+    standby_context, _ = session["standby"]
+    session.update(standby=None, standby_crashed=False)
+    metrics.set("standby_ready", 0)
+    try:
+        standby_context.close()
+    except:
+        pass
+    session["standby"] = prepare_standby(session["browser"], session)
+
+def failover_to_standby(session, reason):
+    """Move the game onto the standby context and retire the failed one"""
+    started = time.monotonic()
+    if session.get("standby_crashed"):
+        replace_standby(session)
+        if not session["standby"]:
+            raise RuntimeError(f"No healthy standby context for failover ({reason})")
+    standby_context, standby_page = session["standby"]
+    session["standby"] = None
+    metrics.set("standby_ready", 0)
+    print_and_notify(f"🔀 Failing over to standby context: {reason}", "WARNING")
+    
+    old_context = session["context"]
+    session.update(context=standby_context, page=standby_page, crashed=False)
+    game_socket.update(url=None, ws=None, closed=False)
+    try:
+        old_context.close()
+    except:
+        pass
+    
+    run_steps(standby_page, GAME_STEPS, label="[failover] ")
+    if LOW_MEMORY_MODE:
+        release_page_resources(standby_context, standby_page)
+    session["monitoring_since"] = time.time()
+    metrics.set("monitoring_since", session["monitoring_since"])
+    metrics.set("current_step", "Monitoring")
+    
+    elapsed = time.monotonic() - started
+    metrics.incr("failovers", reason=reason.split(":")[0])
+    metrics.set("last_failover_seconds", round(elapsed, 3))
+    metrics.observe("failover_ms", elapsed * 1000)
+    print_and_notify(f"✅ Failover completed in {elapsed:.1f}s", "SUCCESS")
+    
+    # Park a fresh standby for the next failure
+    session["standby"] = prepare_standby(session["browser"], session)
+
+def handle_sigterm(signum, frame):
+    """Let a stopped daemon run its normal cleanup"""
+    raise KeyboardInterrupt()
+
 # ================= MODIFIED MAIN EXECUTION =================
 def main():
+    global script_completed
+    from playwright.sync_api import sync_playwright
+    init_runtime()
     # Use IST time for startup - send as batch
     startup_time = format_ist_time()
     
@@ -876,12 +3157,24 @@ def main():
     startup_messages = [
         (f"🚀 <b>Ice Fishing Monitor Started</b>", "INFO", True),
         (f"• Start Time: {startup_time} IST", "INFO", True),
-        (f"• Mode: Headless Browser", "INFO", True),
-        (f"• Log Channel: @{LOG_CHAT_ID.replace('-100', '')}", "INFO", True),
-        (f"• File Channel: @{FILE_CHAT_ID.replace('-100', '')}", "INFO", True),
+        (f"• Mode: {'Warm Browser Daemon' if DAEMON_MODE else 'Headless Browser'}", "INFO", True),
+        (f"• Log Channel: @{(LOG_CHAT_ID or 'unset').replace('-100', '')}", "INFO", True),
+        (f"• File Channel: @{(FILE_CHAT_ID or 'unset').replace('-100', '')}", "INFO", True),
     ]
     
     print_and_notify("━━━━━━━━━━━━━━━━━━━━", "INFO", False)
+    
+    if DAEMON_MODE:
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    
+    if start_metrics_server():
+        print_and_notify(f"Metrics endpoint: http://{METRICS_HOST}:{METRICS_PORT}/metrics", "DEBUG", send_to_telegram=False)
+    
+    # Deliver anything left in the outbox by earlier runs first
+    if len(tg.outbox):
+        print_and_notify(f"Outbox has {len(tg.outbox)} pending item(s) - delivering", "INFO", False)
+        tg.outbox.drain(tg, force=True)
+    
     send_batch_messages(startup_messages, delay=2)
     print_and_notify("━━━━━━━━━━━━━━━━━━━━", "INFO", False)
     
@@ -894,13 +3187,7 @@ def main():
                 try:
                     browser = p.chromium.launch(
     headless=True,
-    args=[
-        "--no-sandbox",
-        "--disable-dev-shm-usage",
-        "--disable-blink-features=AutomationControlled",
-        "--window-size=1920,1080",
-        "--mute-audio"
-    ]
+    args=get_browser_args()
 )
 
 
@@ -912,44 +3199,39 @@ def main():
             if browser is None:
                 raise Exception("Failed to launch browser in any mode")
             
-            # Set timezone to Asia/Kolkata (IST) for browser context
-            context = browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                locale='en-US',
-                timezone_id='Asia/Kolkata',  # Changed to IST timezone
-                ignore_https_errors=True
-            )
+            context = new_capture_context(browser)
             attach_context_ws(context)
 
             print_and_notify("🧠 Context WebSocket listener attached", "SUCCESS")
 
-
-            page = context.new_page()
-            page.set_default_timeout(90000)
+            # Everything the wait loops need; failover swaps context/page in place
+            session = {
+                "browser": browser,
+                "context": context,
+                "page": None,
+                "standby": None,
+                "crashed": False,
+                "standby_crashed": False,
+                "monitoring_since": None,
+                "last_memory_sample": 0,
+                "rollup_day": None,
+            }
+            session["page"] = new_capture_page(context, session)
             
             try:
-                steps = [
-    ("1. Login", step1_login),
-    ("2. Close Popups", step2_close_popup),
-    ("3. Open Casino", step3_click_casino),
-    ("4. Select Evolution", step4_click_evolution),
-
-    # 🔥 MOVE THIS UP
-    ("6. Setup WebSocket", step6_attach_ws),
-
-    ("5. Load Platform", step5_wait_evolution),
-    ("7. Launch Game", step7_open_ice_fishing),]
-
+                if STANDBY_CONTEXT:
+                    session["standby"] = prepare_standby(browser, session)
                 
-                for step_name, step_func in steps:
-                    print_and_notify(f"Starting {step_name}...", "INFO")
-                    step_func(page)
-                    print_and_notify(f"Completed {step_name}", "SUCCESS")
-                    
-                    # Add delay between steps to reduce Telegram messages
-                    if step_name != "7. Launch Game":
-                        time.sleep(3)  # Increased from 2 to 3 seconds
+                steps = LOBBY_STEPS + GAME_STEPS
+                
+                try:
+                    run_steps(session["page"], steps)
+                except Exception as e:
+                    if not session["standby"]:
+                        raise
+                    failover_to_standby(session, f"step failed: {str(e)[:100]}")
+                
+                page = session["page"]
                 
                 # Send monitoring active message
                 monitoring_msg = f"""
@@ -962,21 +3244,60 @@ def main():
 • Rate limiting: Enabled
 ━━━━━━━━━━━━━━━━━━━━"""
                 print_and_notify(monitoring_msg, "SUCCESS")
+                metrics.set("current_step", "Monitoring")
+                session["monitoring_since"] = time.time()
+                metrics.set("monitoring_since", session["monitoring_since"])
                 
-                # Script will exit automatically after first spin history is sent
-                # Keep running until first spin history is captured
-                while True:
-                    time.sleep(1)  # Just keep the script alive until WebSocket captures data
-                    
-                    # Check if script should exit
-                    global script_completed
-                    if script_completed:
+                if DIRECT_WS_MODE and not DAEMON_MODE and not script_completed:
+                    client = start_direct_capture(session["context"], page)
+                    if client:
+                        # The browser is no longer needed once the native socket is up
+                        try:
+                            if session["standby"]:
+                                session["standby"][0].close()
+                                session["standby"] = None
+                            session["context"].close()
+                            browser.close()
+                        except:
+                            pass
+                        print_and_notify("Chromium closed - capturing over direct WebSocket", "INFO")
+                        run_direct_capture(client)
                         print_and_notify("🛑 Script completed successfully - exiting", "INFO")
                         return
+                
+                if LOW_MEMORY_MODE:
+                    release_page_resources(session["context"], page)
+                
+                while True:
+                    try:
+                        if DAEMON_MODE:
+                            run_capture_daemon(session)
+                            return
+                        
+                        # Script will exit automatically after first spin history is sent
+                        # Keep running until first spin history is captured
+                        while True:
+                            # Keep the script alive until WebSocket captures data; waiting inside
+                            # Playwright keeps frame, close and crash events flowing
+                            wait_on_page(session)
+                            
+                            run_housekeeping(session)
+                            
+                            # Check if script should exit
+                            if script_completed:
+                                print_and_notify("🛑 Script completed successfully - exiting", "INFO")
+                                return
+                    except KeyboardInterrupt:
+                        raise
+                    except Exception as e:
+                        if not session["standby"]:
+                            raise
+                        failover_to_standby(session, f"error: {str(e)[:100]}")
                     
             except KeyboardInterrupt:
                 print_and_notify("\n🛑 Monitor stopped by user", "INFO")
             except Exception as e:
+                metrics.set("current_step", "Failed")
                 error_details = f"""
 🔥 <b>EXECUTION ERROR</b>
 ━━━━━━━━━━━━━━━━━━━━
@@ -987,9 +3308,22 @@ def main():
                 
             finally:
                 print_and_notify("Cleaning up browser resources...", "INFO")
+                frame_processor.shutdown()
                 spin_manager.cleanup()  # Cleanup JSON file
+                sample_browser_memory()
+                
+                # Last delivery attempt; anything still pending stays on disk for the next run
+                if len(tg.outbox):
+                    tg.outbox.drain(tg, force=True)
+                    if len(tg.outbox):
+                        print_and_notify(f"{len(tg.outbox)} item(s) left in outbox {OUTBOX_DIR}", "WARNING", False)
+                log_latency_summary()
+                metrics.export()
+                rollup_pending_days()
                 try:
-                    context.close()
+                    if session["standby"]:
+                        session["standby"][0].close()
+                    session["context"].close()
                     if browser:
                         browser.close()
                 except:
@@ -1007,5 +3341,153 @@ def main():
 ━━━━━━━━━━━━━━━━━━━━"""
     print_and_notify(shutdown_msg, "INFO")
 
+# ================= COMMAND LINE =================
+def day_range(args):
+    """Inclusive (start, end) IST days from --start/--end/--days"""
+    end = args.end or format_ist_time(format_str="%Y-%m-%d")
+    if args.start:
+        return args.start, end
+    start = datetime.strptime(end, "%Y-%m-%d").date() - timedelta(days=args.days - 1)
+    return start.isoformat(), end
+
+def load_spin_columns(start, end, columns=None):
+    """Archived spins for a day range as a dict of lists"""
+    data = read_spin_archives(start, end, columns)
+    return data if isinstance(data, dict) else data.to_pydict()
+
+def cmd_capture(args):
+    main()
+    return 0
+
+def cmd_replay(args):
+    """Decode saved spinHistory frames; --send runs them through the live pipeline"""
+    if args.send:
+        init_runtime()
+        # Replayed frames go out back to back, not at the live capture pace
+        spin_manager.min_send_interval = 0
+    failed = 0
+    for filename in args.files:
+        try:
+            with open(filename, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"{filename}: cannot read ({e})")
+            failed += 1
+            continue
+        if args.send:
+            sent = process_spin_frame(data, complete_run=False)
+            if sent is None:
+                print(f"{filename}: no new spins")
+            elif sent:
+                print(f"{filename}: sent")
+            else:
+                print(f"{filename}: FAILED")
+                failed += 1
+            continue
+        _, spins, records = decode_spin_frame(data)
+        if spins is None:
+            print(f"{filename}: no spin history found")
+            continue
+        print(f"{filename}: {len(records)} spins")
+        print(extract_spin_summary(data, records))
+    if args.send:
+        spin_manager.cleanup()
+        if len(tg.outbox):
+            tg.outbox.drain(tg, force=True)
+            if len(tg.outbox):
+                print(f"Outbox: {len(tg.outbox)} pending (deliver with send-pending)")
+    return 1 if failed else 0
+
+def cmd_stats(args):
+    start, end = day_range(args)
+    data = load_spin_columns(start, end, ["bet", "win", "fish", "multiplier"])
+    bets = [v for v in data["bet"] if v is not None]
+    wins = [v for v in data["win"] if v is not None]
+    multipliers = [v for v in data["multiplier"] if v is not None]
+    fish = {}
+    for value in data["fish"]:
+        if value is not None:
+            fish[value] = fish.get(value, 0) + 1
+    
+    print(f"Spins {start} → {end}: {len(data['bet'])}")
+    if bets:
+        print(f"• Total bet: {format_spin_value(sum(bets))}")
+    if wins:
+        print(f"• Total win: {format_spin_value(sum(wins))}")
+    if bets and wins and sum(bets):
+        print(f"• Return: {sum(wins) / sum(bets):.2%}")
+    if multipliers:
+        print(f"• Multiplier: avg {format_spin_value(sum(multipliers) / len(multipliers))}, max {format_spin_value(max(multipliers))}")
+    for name, count in sorted(fish.items(), key=lambda item: -item[1])[:10]:
+        print(f"• {name}: {count}")
+    return 0
+
+def cmd_export(args):
+    start, end = day_range(args)
+    data = load_spin_columns(start, end)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        rows = zip(*(data[name] for name in ARCHIVE_COLUMNS))
+        if args.format == "csv":
+            writer = csv.writer(out)
+            writer.writerow(ARCHIVE_COLUMNS)
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                out.write(json.dumps(dict(zip(ARCHIVE_COLUMNS, row)), ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if out is not sys.stdout:
+        print(f"Exported {len(data['spin_id'])} spins ({start} → {end}) to {args.output}")
+    return 0
+
+def cmd_rollup(args):
+    archived = rollup_pending_days(include_today=args.include_today)
+    print(f"Archived {len(archived)} day(s) into {ARCHIVE_DIR}")
+    return 0
+
+def cmd_send_pending(args):
+    notifier = init_telegram()
+    pending = len(notifier.outbox)
+    if pending:
+        notifier.outbox.drain(notifier, force=True)
+    left = len(notifier.outbox)
+    print(f"Outbox: {pending - left} delivered, {left} pending")
+    return 1 if left else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Ice Fishing spin history monitor")
+    commands = parser.add_subparsers(dest="command")
+    
+    commands.add_parser("capture", help="log in and capture spin history (default)").set_defaults(func=cmd_capture)
+    
+    replay = commands.add_parser("replay", help="decode saved spinHistory JSON files")
+    replay.add_argument("files", nargs="+")
+    replay.add_argument("--send", action="store_true", help="store and deliver them like live frames")
+    replay.set_defaults(func=cmd_replay)
+    
+    for name, func, help_text in (("stats", cmd_stats, "summarise archived spins"),
+                                  ("export", cmd_export, "export archived spins")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--start", help="first IST day (YYYY-MM-DD)")
+        command.add_argument("--end", help="last IST day (default: today)")
+        command.add_argument("--days", type=int, default=1, help="days back from --end when --start is not given")
+        command.set_defaults(func=func)
+        if name == "export":
+            command.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+            command.add_argument("--output", default="-", help="output file (default: stdout)")
+    
+    rollup = commands.add_parser("rollup", help="archive finished journal days and prune their journals")
+    rollup.add_argument("--include-today", action="store_true", help="also write a provisional archive for today")
+    rollup.set_defaults(func=cmd_rollup)
+    
+    commands.add_parser("send-pending", help="deliver items waiting in the Telegram outbox").set_defaults(func=cmd_send_pending)
+    return parser
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    return getattr(args, "func", cmd_capture)(args)
+
 if __name__ == "__main__":
-    main()	
+    sys.exit(cli())	
@@ -0,0 +1,78 @@
+"""Cron field parsing and CaptureSchedule.next_run (IST)"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+
+
+def ist(*args):
+    return datetime(*args, tzinfo=app.IST)
+
+
+@pytest.mark.parametrize("field, low, high, expected", [
+    ("*", 0, 5, {0, 1, 2, 3, 4, 5}),
+    ("*/15", 0, 59, {0, 15, 30, 45}),
+    ("5/15", 0, 59, {5, 20, 35, 50}),
+    ("7", 0, 59, {7}),
+    ("1-5", 0, 7, {1, 2, 3, 4, 5}),
+    ("10-20/5", 0, 59, {10, 15, 20}),
+    ("1,3,5-6", 1, 31, {1, 3, 5, 6}),
+    ("0/20,30", 0, 59, {0, 20, 30, 40}),
+])
+def test_parse_cron_field(field, low, high, expected):
+    assert app.parse_cron_field(field, low, high) == expected
+
+
+@pytest.mark.parametrize("field", ["60", "0-60", "*/0", "x", "5-"])
+def test_parse_cron_field_rejects_invalid(field):
+    with pytest.raises(ValueError):
+        app.parse_cron_field(field, 0, 59)
+
+
+def test_needs_five_fields():
+    with pytest.raises(ValueError):
+        app.CaptureSchedule(cron="0 9 * *")
+
+
+def test_interval_schedule():
+    schedule = app.CaptureSchedule(interval=900, cron="")
+    assert schedule.next_run(ist(2026, 10, 18, 12, 0, 30)) == ist(2026, 10, 18, 12, 15, 30)
+
+
+def test_next_run_every_quarter_hour_from_offset():
+    schedule = app.CaptureSchedule(cron="5/15 * * * *")
+    assert schedule.next_run(ist(2026, 10, 18, 12, 6)) == ist(2026, 10, 18, 12, 20)
+    assert schedule.next_run(ist(2026, 10, 18, 12, 50, 59)) == ist(2026, 10, 18, 13, 5)
+
+
+def test_day_fields_are_ored_when_both_restricted():
+    # 09:00 on the 1st of the month OR on any Monday (2026-10-19 is a Monday)
+    schedule = app.CaptureSchedule(cron="0 9 1 * 1")
+    assert schedule.next_run(ist(2026, 10, 18, 12, 0)) == ist(2026, 10, 19, 9, 0)
+    assert schedule.next_run(ist(2026, 10, 27, 12, 0)) == ist(2026, 11, 1, 9, 0)
+
+
+def test_weekday_alone_restricts_days():
+    schedule = app.CaptureSchedule(cron="30 6 * * 0")  # Sundays
+    assert schedule.next_run(ist(2026, 10, 18, 6, 30)) == ist(2026, 10, 25, 6, 30)
+    assert app.CaptureSchedule(cron="30 6 * * 7").next_run(ist(2026, 10, 18, 6, 30)) == ist(2026, 10, 25, 6, 30)
+
+
+def test_day_of_month_alone_restricts_days():
+    schedule = app.CaptureSchedule(cron="0 0 31 * *")
+    assert schedule.next_run(ist(2026, 11, 1, 0, 0)) == ist(2026, 12, 31, 0, 0)
+
+
+def test_leap_day_schedule():
+    schedule = app.CaptureSchedule(cron="0 12 29 2 *")
+    assert schedule.next_run(ist(2026, 10, 18, 0, 0)) == ist(2028, 2, 29, 12, 0)
+
+
+def test_impossible_schedule_raises():
+    with pytest.raises(ValueError):
+        app.CaptureSchedule(cron="0 0 31 2 *").next_run(ist(2026, 10, 18, 0, 0))
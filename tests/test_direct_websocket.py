@@ -0,0 +1,227 @@
+"""DirectWebSocketClient against a local stdlib stand-in for the game server"""
+import base64
+import hashlib
+import os
+import socket
+import struct
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+
+
+def server_frame(opcode, payload=b"", fin=True):
+    """Unmasked server-to-client frame"""
+    header = bytearray([(0x80 if fin else 0) | opcode])
+    length = len(payload)
+    if length < 126:
+        header.append(length)
+    elif length < 65536:
+        header.append(126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(127)
+        header += struct.pack("!Q", length)
+    return bytes(header) + payload
+
+
+def recv_exact(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("client closed")
+        data += chunk
+    return data
+
+
+def read_client_frame(conn):
+    """(opcode, unmasked payload) of the next client frame"""
+    first, second = recv_exact(conn, 2)
+    assert second & 0x80, "client frames must be masked"
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", recv_exact(conn, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", recv_exact(conn, 8))[0]
+    mask = recv_exact(conn, 4)
+    payload = recv_exact(conn, length)
+    return first & 0x0F, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+class StandInServer:
+    """Accepts one connection per handler; each handler runs after the handshake"""
+
+    def __init__(self, handlers, status="101 Switching Protocols"):
+        self.handlers = list(handlers)
+        self.status = status
+        self.requests = []
+        self.errors = []
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen()
+        self.url = f"ws://127.0.0.1:{self.listener.getsockname()[1]}/game?table=1"
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        for handler in self.handlers:
+            conn, _ = self.listener.accept()
+            with conn:
+                try:
+                    request = b""
+                    while b"\r\n\r\n" not in request:
+                        request += conn.recv(4096)
+                    self.requests.append(request.decode("latin-1"))
+                    key = [line.split(":", 1)[1].strip() for line in request.decode("latin-1").split("\r\n")
+                           if line.lower().startswith("sec-websocket-key:")][0]
+                    accept = base64.b64encode(hashlib.sha1((key + app.DirectWebSocketClient.GUID).encode()).digest())
+                    conn.sendall(f"HTTP/1.1 {self.status}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                                 f"Sec-WebSocket-Accept: {accept.decode()}\r\n\r\n".encode())
+                    if handler:
+                        handler(conn)
+                except Exception as e:
+                    self.errors.append(e)
+
+    def close(self):
+        self.thread.join(timeout=5)
+        self.listener.close()
+        assert not self.errors, self.errors
+
+
+class FakePage:
+    url = "https://evo.example/frontend/evo/r2/"
+
+    def evaluate(self, script):
+        return "stand-in-agent"
+
+
+class FakeContext:
+    def cookies(self, urls):
+        return [{"name": "session", "value": "abc"}]
+
+
+def fallbacks():
+    return app.metrics.snapshot()["counters"].get("direct_ws_fallbacks", 0)
+
+
+def connect(server, **kwargs):
+    client = app.DirectWebSocketClient(server.url, **kwargs)
+    client.connect()
+    return client
+
+
+def test_handshake_failure_falls_back_to_browser(monkeypatch):
+    server = StandInServer([None], status="403 Forbidden")
+    monkeypatch.setitem(app.game_socket, "url", server.url)
+    before = fallbacks()
+
+    assert app.start_direct_capture(FakeContext(), FakePage()) is None
+    assert fallbacks() == before + 1
+    server.close()
+    assert "Cookie: session=abc" in server.requests[0]
+    assert "GET /game?table=1 HTTP/1.1" in server.requests[0]
+
+
+def test_fragmented_text_message():
+    def handler(conn):
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_TEXT, b'{"type":', fin=False))
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_CONT, b'"icefishing.', fin=False))
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_CONT, b'spinHistory"}'))
+
+    server = StandInServer([handler])
+    client = connect(server)
+    assert client.recv_message() == '{"type":"icefishing.spinHistory"}'
+    client.close()
+    server.close()
+
+
+def test_ping_is_answered_with_pong():
+    pongs = []
+
+    def handler(conn):
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_PING, b"are-you-there"))
+        pongs.append(read_client_frame(conn))
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_TEXT, b"after-ping"))
+
+    server = StandInServer([handler])
+    client = connect(server)
+    assert client.recv_message() == "after-ping"
+    client.close()
+    server.close()
+    assert pongs == [(app.DirectWebSocketClient.OP_PONG, b"are-you-there")]
+
+
+def test_64_bit_length_binary_message():
+    payload = os.urandom(70000)
+
+    def handler(conn):
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_BINARY, payload))
+
+    server = StandInServer([handler])
+    client = connect(server)
+    assert client.recv_message() == payload
+    client.close()
+    server.close()
+
+
+def test_server_close_ends_run():
+    closes = []
+
+    def handler(conn):
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_CLOSE, struct.pack("!H", 1001)))
+        closes.append(read_client_frame(conn))
+
+    server = StandInServer([handler])
+    client = connect(server)
+    assert client.run(lambda message: None, lambda: False) is False
+    client.close()
+    server.close()
+    assert closes == [(app.DirectWebSocketClient.OP_CLOSE, struct.pack("!H", 1001))]
+
+
+def test_run_direct_capture_reconnects(monkeypatch):
+    def drop(conn):
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_CLOSE, struct.pack("!H", 1012)))
+
+    def deliver(conn):
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_TEXT, b"spin-frame"))
+        read_client_frame(conn)  # Client close on shutdown
+
+    class Recorder:
+        def __init__(self):
+            self.frames = []
+
+        def submit(self, frame, socket_key="default"):
+            self.frames.append((frame, socket_key))
+            app.script_completed = True
+
+    recorder = Recorder()
+    monkeypatch.setattr(app, "frame_processor", recorder)
+    monkeypatch.setattr(app, "script_completed", False)
+    monkeypatch.setattr(app.time, "sleep", lambda seconds: None)
+
+    server = StandInServer([drop, deliver])
+    client = connect(server)
+    app.run_direct_capture(client, max_reconnects=1)
+    server.close()
+    assert recorder.frames == [("spin-frame", "direct")]
+    assert client.sock is None
+
+
+def test_run_direct_capture_gives_up_after_max_reconnects(monkeypatch):
+    def drop(conn):
+        conn.sendall(server_frame(app.DirectWebSocketClient.OP_CLOSE, struct.pack("!H", 1012)))
+
+    monkeypatch.setattr(app, "script_completed", False)
+    monkeypatch.setattr(app.time, "sleep", lambda seconds: None)
+
+    server = StandInServer([drop, drop])
+    client = connect(server)
+    with pytest.raises(Exception, match="closed by server"):
+        app.run_direct_capture(client, max_reconnects=1)
+    server.close()
@@ -0,0 +1,93 @@
+"""Metrics endpoint: /health status codes and derived fields in both formats"""
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    monkeypatch.setattr(app, "metrics", app.RunMetrics())
+    monkeypatch.setattr(app, "script_completed", False)
+    monkeypatch.setattr(app, "SOCKET_IDLE_TIMEOUT", 180)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), app.MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+def test_health_ok_while_frames_arrive(endpoint):
+    app.metrics.set("current_step", "Monitoring")
+    app.metrics.set("monitoring_since", time.time() - 600)
+    app.metrics.set("last_frame_time", time.time() - 5)
+
+    status, body = get(endpoint + "/health")
+    health = json.loads(body)
+    assert status == 200
+    assert health["healthy"] is True
+    assert health["problems"] == []
+    assert 4 <= health["seconds_since_last_frame"] < 60
+
+
+def test_health_503_when_socket_idle(endpoint):
+    app.metrics.set("current_step", "Monitoring")
+    app.metrics.set("monitoring_since", time.time() - 600)
+    app.metrics.set("last_frame_time", time.time() - 400)
+
+    status, body = get(endpoint + "/health")
+    assert status == 503
+    assert json.loads(body)["problems"] == ["no frames for 180s"]
+
+    # The plain JSON view still answers 200 for scrapers that only collect data
+    status, _ = get(endpoint + "/metrics.json")
+    assert status == 200
+
+
+def test_health_503_on_failure_step_or_open_breaker(endpoint):
+    app.metrics.set("current_step", "Page crashed")
+    app.metrics.set("circuit_open", 1, dependency="telegram")
+
+    status, body = get(endpoint + "/health")
+    assert status == 503
+    assert json.loads(body)["problems"] == ["step: Page crashed", "circuit_open{dependency=telegram}"]
+
+
+def test_health_ignores_idle_time_before_monitoring(endpoint):
+    app.metrics.set("current_step", "1. Login")
+
+    status, body = get(endpoint + "/health")
+    assert status == 200
+    assert json.loads(body)["seconds_since_last_frame"] is None
+
+
+def test_prometheus_exports_derived_fields(endpoint):
+    app.metrics.set("last_frame_time", time.time() - 10)
+    app.metrics.incr("frames_received", socket="game")
+
+    status, body = get(endpoint + "/metrics")
+    assert status == 200
+    lines = body.splitlines()
+    assert "# TYPE icefishing_seconds_since_last_frame gauge" in lines
+    assert any(line.startswith("icefishing_seconds_since_last_frame 1") for line in lines)
+    assert "icefishing_completed 0" in lines
+    assert "icefishing_healthy 1" in lines
+    assert 'icefishing_frames_received_total{socket="game"} 1' in lines
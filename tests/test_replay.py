@@ -0,0 +1,74 @@
+"""replay --send delivers every file and reports per-file results"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+
+
+class RecordingNotifier:
+    """Accepts every upload; files listed in reject get a 400"""
+
+    def __init__(self, outbox, reject=()):
+        self.outbox = outbox
+        self.reject = set(reject)
+        self.files = []
+
+    def send_message(self, text, parse_mode="HTML", is_file_notification=False, chat_id_override=None, spool=True):
+        return {"ok": True}
+
+    def send_file(self, filename, caption="", chat_id_override=None, spool=True):
+        with open(filename, "r", encoding="utf-8") as f:
+            spins = json.load(f)["spinHistory"]
+        if any(spin["id"] in self.reject for spin in spins):
+            return {"ok": False, "error_code": 400, "description": "Bad Request"}
+        self.files.append([spin["id"] for spin in spins])
+        return {"ok": True}
+
+
+def write_frame(tmp_path, name, ids):
+    path = tmp_path / name
+    path.write_text(json.dumps({"spinHistory": [{"id": i, "bet": 1, "win": 0} for i in ids]}), encoding="utf-8")
+    return str(path)
+
+
+def replay(monkeypatch, notifier, files):
+    monkeypatch.setattr(app, "tg", notifier)
+    monkeypatch.setattr(app, "spin_manager", None)
+    monkeypatch.setattr(app, "frame_processor", object())
+    monkeypatch.setattr(app, "script_completed", False)
+    args = app.build_parser().parse_args(["replay", "--send", *files])
+    return args.func(args)
+
+
+def test_every_file_is_delivered(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    files = [write_frame(tmp_path, "a.json", ["1", "2"]),
+             write_frame(tmp_path, "b.json", ["1", "2", "3"]),
+             write_frame(tmp_path, "c.json", ["2", "3"])]
+    notifier = RecordingNotifier(app.TelegramOutbox(str(tmp_path / "outbox")))
+
+    assert replay(monkeypatch, notifier, files) == 0
+    assert notifier.files == [["1", "2"], ["3"]]
+    out = capsys.readouterr().out
+    assert f"{files[0]}: sent" in out and f"{files[1]}: sent" in out
+    assert f"{files[2]}: no new spins" in out
+    # The last delivered file is cleaned up like at the end of a capture
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("spinHistory")]
+
+
+def test_failed_file_gives_non_zero_exit(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    files = [write_frame(tmp_path, "a.json", ["1"]),
+             write_frame(tmp_path, "b.json", ["bad"]),
+             str(tmp_path / "missing.json")]
+    notifier = RecordingNotifier(app.TelegramOutbox(str(tmp_path / "outbox")), reject={"bad"})
+
+    assert replay(monkeypatch, notifier, files) == 1
+    assert notifier.files == [["1"]]
+    out = capsys.readouterr().out
+    assert f"{files[0]}: sent" in out
+    assert f"{files[1]}: FAILED" in out
+    assert f"{files[2]}: cannot read" in out
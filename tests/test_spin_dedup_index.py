@@ -0,0 +1,75 @@
+"""SpinDedupIndex persistence, merge/commit and recovery"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+
+
+def test_commit_persists_across_reopen(tmp_path):
+    filename = str(tmp_path / "spin_index.bin")
+    index = app.SpinDedupIndex(filename)
+    index.add(["a", "b", "c"])
+    assert "a" in index and len(index) == 3
+    assert not os.path.exists(filename)  # Nothing on disk before commit
+
+    index.commit()
+    assert os.path.getsize(filename) == 3 * 8
+
+    reopened = app.SpinDedupIndex(filename)
+    assert len(reopened) == 3
+    assert all(spin_id in reopened for spin_id in ("a", "b", "c"))
+    assert "d" not in reopened
+
+
+def test_commit_merges_sorted_without_duplicates(tmp_path):
+    filename = str(tmp_path / "spin_index.bin")
+    index = app.SpinDedupIndex(filename)
+    index.add([f"spin-{i}" for i in range(0, 100, 2)])
+    index.commit()
+
+    index.add([f"spin-{i}" for i in range(100)])  # Half of them already stored
+    assert len(index) == 100
+    index.commit()
+
+    assert not os.path.exists(filename + ".tmp")
+    assert os.path.getsize(filename) == 100 * 8
+    keys = list(app.SpinDedupIndex(filename).keys)
+    assert keys == sorted(set(keys)) and len(keys) == 100
+    assert app.metrics.get("spin_index_size") == 100
+
+
+def test_corrupt_file_is_set_aside(tmp_path):
+    filename = str(tmp_path / "spin_index.bin")
+    with open(filename, "wb") as f:
+        f.write(b"\x00" * 13)  # Not a whole number of keys
+
+    index = app.SpinDedupIndex(filename)
+    assert len(index) == 0
+    assert not os.path.exists(filename)
+    with open(filename + ".corrupt", "rb") as f:
+        assert f.read() == b"\x00" * 13
+
+    index.add(["a"])
+    index.commit()
+    assert "a" in app.SpinDedupIndex(filename)
+
+
+def test_legacy_delivered_ids_are_migrated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open(app.SPIN_STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"delivered_ids": ["old-1", "old-2"]}, f)
+
+    manager = app.SpinHistoryManager(delivery_mode="delta")
+    assert "delivered_ids" not in manager.state
+    assert "old-1" in manager.index and "old-2" in manager.index
+    assert len(app.SpinDedupIndex(app.SPIN_INDEX_FILE)) == 2
+
+    # An existing index is never overwritten by a stale ID list
+    with open(app.SPIN_STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"delivered_ids": ["stale"]}, f)
+    manager = app.SpinHistoryManager(delivery_mode="delta")
+    assert "stale" not in manager.index
+    assert len(manager.index) == 2
@@ -0,0 +1,121 @@
+"""TelegramOutbox spooling, ordered drain, backoff and dead-lettering"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+
+OK = {"ok": True}
+REJECTED = {"ok": False, "error_code": 400, "description": "Bad Request: can't parse entities"}
+
+
+class ScriptedNotifier:
+    """Records deliveries; results are taken from a script, then default to OK"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.sent = []
+
+    def _result(self, item):
+        result = self.results.pop(0) if self.results else OK
+        if result is not None and result.get("ok"):
+            self.sent.append(item)
+        return result
+
+    def send_message(self, text, parse_mode="HTML", chat_id_override=None, spool=True):
+        assert spool is False
+        return self._result(("message", chat_id_override, text))
+
+    def send_file(self, filename, caption="", chat_id_override=None, spool=True):
+        assert spool is False
+        with open(filename, "r", encoding="utf-8") as f:
+            return self._result(("file", chat_id_override, f.read()))
+
+
+def make_file(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_drains_in_enqueue_order(tmp_path):
+    outbox = app.TelegramOutbox(str(tmp_path / "outbox"))
+    outbox.enqueue_message("-1001", "first")
+    outbox.enqueue_file("-1002", make_file(tmp_path, "spins.json", "{}"), "caption")
+    outbox.enqueue_message("-1001", "third")
+    assert len(outbox) == 3
+
+    notifier = ScriptedNotifier()
+    assert outbox.drain(notifier) == 3
+    assert notifier.sent == [("message", "-1001", "first"), ("file", "-1002", "{}"), ("message", "-1001", "third")]
+    assert len(outbox) == 0
+    assert os.listdir(tmp_path / "outbox") == []
+
+
+def test_stops_at_first_failure_and_backs_off(tmp_path):
+    outbox = app.TelegramOutbox(str(tmp_path / "outbox"))
+    for text in ("one", "two", "three"):
+        outbox.enqueue_message("-1001", text)
+
+    notifier = ScriptedNotifier(OK, None)
+    assert outbox.drain(notifier) == 1
+    assert [item[2] for item in notifier.sent] == ["one"]
+    assert len(outbox) == 2
+    assert outbox.in_backoff()
+
+    # Backoff is honoured unless forced, and doubles on repeated failures
+    assert outbox.drain(notifier) == 0
+    first_delay = outbox.next_attempt
+    notifier.results = [None]
+    assert outbox.drain(notifier, force=True) == 0
+    assert outbox.failures == 2
+    assert outbox.next_attempt > first_delay
+
+    assert outbox.drain(notifier, force=True) == 2
+    assert [item[2] for item in notifier.sent] == ["one", "two", "three"]
+    assert not outbox.in_backoff()
+    assert outbox.failures == 0
+
+
+def test_rejected_entries_are_dead_lettered(tmp_path):
+    outbox = app.TelegramOutbox(str(tmp_path / "outbox"))
+    outbox.enqueue_message("-1001", "<b>unclosed")
+    outbox.enqueue_file("-1002", make_file(tmp_path, "bad.json", "bad"), "caption")
+    outbox.enqueue_message("-1001", "hello")
+
+    notifier = ScriptedNotifier(REJECTED, REJECTED, OK)
+    assert outbox.drain(notifier) == 1
+    assert notifier.sent == [("message", "-1001", "hello")]
+    assert len(outbox) == 0
+
+    dead = sorted(os.listdir(outbox.dead_directory))
+    entries = [name for name in dead if name.endswith(".entry.json")]
+    assert len(entries) == 2
+    with open(os.path.join(outbox.dead_directory, entries[1]), "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    assert entry["rejected"].startswith("400 ")
+    assert os.path.dirname(entry["path"]) == outbox.dead_directory
+    assert os.path.exists(entry["path"])
+
+
+def test_pending_entries_survive_restart(tmp_path):
+    directory = str(tmp_path / "outbox")
+    original = make_file(tmp_path, "spinHistory.json", '{"spins": 3}')
+    first_run = app.TelegramOutbox(directory)
+    first_run.enqueue_message("-1001", "queued before exit")
+    first_run.enqueue_file("-1002", original, "caption")
+    os.remove(original)  # Spin manager cleanup must not lose the spooled copy
+
+    second_run = app.TelegramOutbox(directory)
+    second_run.enqueue_message("-1001", "queued after restart")
+    assert len(second_run) == 3
+
+    notifier = ScriptedNotifier()
+    assert second_run.drain(notifier) == 3
+    assert notifier.sent == [
+        ("message", "-1001", "queued before exit"),
+        ("file", "-1002", '{"spins": 3}'),
+        ("message", "-1001", "queued after restart"),
+    ]